@@ -4,7 +4,7 @@ The metrics dash app with data from tempo
 
 import os
 
-from dash import Dash, html
+from dash import Dash
 from dash.dependencies import Input, Output
 
 from metrics import index
@@ -35,9 +35,9 @@ app.scripts.config.serve_locally = True
 # Setup the server for gunicorn (prod)
 server = app.server
 
-app.layout = html.Div(
-    className="px-8", children=[index.pageheader, index.tab_structure, html.Div(id="tabs-content-graph")]
-)
+# A function, so that every page load gets the tabs of the latest snapshot
+app.layout = index.layout
+index.startRefresh()
 
 
 @app.callback(Output("tabs-content-graph", "children"), Input("tabs-graph", "value"))
@@ -0,0 +1,94 @@
+"""Timeline of the summed allocations of every user"""
+
+import numpy as np
+import pandas as pd
+
+ALLOCATION_COLORS = {
+    "Unconfirmed": "red",
+    "Unconfirmed (< 40%)": "lightred",
+    "Unconfirmed (> 80%)": "darkred",
+    "Missing Jira": "gray",
+    "Missing Jira (< 40%)": "lightgray",
+    "Missing Jira (> 80%)": "darkslategray",
+    "OK": "#2FB115",
+    "Less than 40%": "lightgreen",
+    "More than 80%": "darkgreen",
+}
+
+
+def allocationTimeline(allocations: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the contiguous periods, Start to Stop both included, in which the allocations of a user
+    do not change, with the summed Allocation, Unconfirmed if any is and the distinct JiraIDs.
+
+    The allocations are swept as events, +Allocation on the start and -Allocation on the day after the stop,
+    whose cumulative sums per user are the running totals, so nothing is compared pairwise.
+    The JiraIDs are listed in the order they first appear in allocations.
+    """
+    columns = ["User", "Allocation", "Unconfirmed", "JiraID", "Start", "Stop"]
+    if allocations.empty:
+        return pd.DataFrame(columns=columns)
+    allocations = allocations.reset_index(drop=True)
+
+    # The running count, allocation, unconfirmed count and count per JiraID change by each event
+    ids = allocations["JiraID"].unique()
+    changes = np.column_stack(
+        [
+            np.ones(len(allocations)),
+            allocations["Allocation"].to_numpy(dtype=float),
+            allocations["Unconfirmed"].to_numpy(dtype=float),
+            allocations["JiraID"].to_numpy()[:, None] == ids,
+        ]
+    )
+    events = pd.DataFrame(np.concatenate([changes, -changes]))
+    events.insert(0, "User", pd.concat([allocations["User"], allocations["User"]], ignore_index=True))
+    events.insert(
+        1, "Start", pd.concat([allocations["Start"], allocations["Stop"] + pd.Timedelta(days=1)], ignore_index=True)
+    )
+    events = events.groupby(["User", "Start"], as_index=False).sum()
+    running = events.groupby("User")[list(range(changes.shape[1]))].cumsum().to_numpy()
+
+    # Every event begins a period lasting until the next event of the user, periods without allocations are left out
+    summed = events[["User", "Start"]].assign(
+        Stop=events.groupby("User")["Start"].shift(-1) - pd.Timedelta(days=1),
+        Allocation=running[:, 1].round(9),
+        Unconfirmed=running[:, 2] > 0,
+        JiraID=[",".join(ids[counts > 0]) for counts in running[:, 3:]],
+    )
+    summed = summed[summed["Stop"].notna() & (running[:, 0] > 0)].reset_index(drop=True)
+
+    # Adjacent periods of a user with the same allocations are joined
+    previous = summed.shift(1)
+    changed = (
+        (summed["User"] != previous["User"])
+        | (summed["Allocation"] != previous["Allocation"])
+        | (summed["Unconfirmed"] != previous["Unconfirmed"])
+        | (summed["JiraID"] != previous["JiraID"])
+        | (summed["Start"] != previous["Stop"] + pd.Timedelta(days=1))
+    )
+    timeline = summed.groupby(changed.cumsum(), as_index=False).agg(
+        User=("User", "first"),
+        Allocation=("Allocation", "first"),
+        Unconfirmed=("Unconfirmed", "first"),
+        JiraID=("JiraID", "first"),
+        Start=("Start", "min"),
+        Stop=("Stop", "max"),
+    )
+    return timeline[columns].sort_values(by=columns, kind="stable").reset_index(drop=True)
+
+
+def allocationColor(timeline: pd.DataFrame) -> np.ndarray:
+    """
+    Returns the color class of every period of the timeline, a key of ALLOCATION_COLORS.
+    Unconfirmed and missing Jira periods are not split by the allocation.
+    """
+    return np.select(
+        [
+            timeline["Unconfirmed"].astype(bool),
+            timeline["JiraID"].str.contains("?", regex=False),
+            timeline["Allocation"] < 0.4,
+            timeline["Allocation"] > 0.8,
+        ],
+        ["Unconfirmed", "Missing Jira", "Less than 40%", "More than 80%"],
+        "OK",
+    )
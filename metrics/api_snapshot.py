@@ -0,0 +1,166 @@
+"""Record and replay of the responses from the Tempo, Jira and Notion APIs"""
+
+import gzip
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Optional
+
+import pandas as pd
+
+from metrics.constants import TEMPO_SNAPSHOT_MODE, TEMPO_SNAPSHOT_PATH
+
+SNAPSHOT_VERSION = 1
+
+
+class Resource:
+    """Stand-in for a replayed Jira resource, the raw fields are available as attributes"""
+
+    def __init__(self, raw: dict) -> None:
+        self.raw = raw
+        self.__dict__.update(raw)
+
+
+def rawList(result) -> list:
+    return [item.raw for item in result]
+
+
+def resourceList(raw: list) -> list:
+    return [Resource(item) for item in raw]
+
+
+def rawResource(result) -> dict:
+    return result.raw
+
+
+# method name: (encode, decode) of the result, None if the result already is plain JSON
+TEMPO_METHODS: dict[str, tuple] = {"get_worklogs": (None, None)}
+JIRA_METHODS: dict[str, tuple] = {
+    "search_issues": (rawList, resourceList),
+    "search_users": (rawList, resourceList),
+    "user": (rawResource, Resource),
+}
+
+
+class ApiSnapshot:
+    """
+    Record or replay of the API responses, selected by TEMPO_SNAPSHOT_MODE.
+
+    In "record" mode every response is kept and written to TEMPO_SNAPSHOT_PATH as gzipped JSON.
+    In "replay" mode the responses are read from that file instead, so the pipeline runs
+    without network or credentials, and "today" is the day the snapshot was recorded.
+    """
+
+    path: str
+    mode: str
+    recorded_at: str
+    responses: dict[str, dict[str, Any]]
+
+    def __init__(self, path: str, mode: str = "") -> None:
+        if mode not in ("", "record", "replay"):
+            logging.warning("%s is not a valid snapshot mode, use record or replay", mode)
+            mode = ""
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.recorded_at = str(pd.Timestamp("today"))
+        self.responses = {}
+        if self.replaying:
+            self.read()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    @property
+    def active(self) -> bool:
+        return self.mode != ""
+
+    def read(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as fh:
+            stored = json.load(fh)
+        if stored.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"{self.path} has snapshot version {stored.get('version')}, expected {SNAPSHOT_VERSION}")
+        self.recorded_at = stored["recorded_at"]
+        self.responses = stored["responses"]
+        logging.info("Replaying API responses recorded at %s from %s", self.recorded_at, self.path)
+
+    def write(self) -> None:
+        """Writes the recorded responses, does nothing unless recording"""
+        if not self.recording:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with self.lock, gzip.open(tmp_path, "wt", encoding="utf-8") as fh:
+            json.dump({"version": SNAPSHOT_VERSION, "recorded_at": self.recorded_at, "responses": self.responses}, fh)
+        os.replace(tmp_path, self.path)
+        logging.info("Recorded API responses to %s", self.path)
+
+    def today(self) -> pd.Timestamp:
+        return pd.Timestamp(self.recorded_at) if self.replaying else pd.Timestamp("today")
+
+    def recorded(self, name: str) -> bool:
+        return name in self.responses
+
+    def call(
+        self,
+        name: str,
+        func: Optional[Callable],
+        *args,
+        encode: Optional[Callable] = None,
+        decode: Optional[Callable] = None,
+        **kwargs,
+    ) -> Any:
+        """Calls func, or returns the recorded response when replaying"""
+        key = json.dumps([args, kwargs], sort_keys=True, default=str)
+        if self.replaying:
+            try:
+                response = self.responses[name][key]
+            except KeyError as err:
+                raise KeyError(f"{name} {key} is not recorded in {self.path}") from err
+            return decode(response) if decode else response
+
+        if func is None:
+            raise ValueError(f"No client for {name}")
+        result = func(*args, **kwargs)
+        if self.recording:
+            with self.lock:
+                self.responses.setdefault(name, {})[key] = encode(result) if encode else result
+        return result
+
+    def proxy(self, name: str, client: Any, methods: dict[str, tuple]) -> Any:
+        """Wraps the methods of an API client, returns the client as is unless recording or replaying"""
+        if not self.active:
+            return client
+        return ClientProxy(self, name, client, methods)
+
+
+class ClientProxy:
+    """Records or replays the listed methods of an API client, other attributes are passed through"""
+
+    def __init__(self, snapshot: ApiSnapshot, name: str, client: Any, methods: dict[str, tuple]) -> None:
+        self._snapshot = snapshot
+        self._name = name
+        self._client = client
+        self._methods = methods
+
+    def __getattr__(self, attr: str) -> Any:
+        if attr not in self._methods:
+            if self._client is None:
+                raise AttributeError(f"{self._name}.{attr} is not available when replaying")
+            return getattr(self._client, attr)
+
+        encode, decode = self._methods[attr]
+        func = getattr(self._client, attr) if self._client is not None else None
+
+        def call(*args, **kwargs):
+            return self._snapshot.call(f"{self._name}.{attr}", func, *args, encode=encode, decode=decode, **kwargs)
+
+        return call
+
+
+api_snapshot = ApiSnapshot(TEMPO_SNAPSHOT_PATH, TEMPO_SNAPSHOT_MODE)
@@ -0,0 +1,89 @@
+"""Business days with public holidays and per user work weeks"""
+
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+WEEKMASK = "1111100"
+
+
+class BusinessCalendar:
+    """
+    Counts business days between arrays of dates in one call.
+
+    Holidays have a Date and a Country, holidays without a country apply to every country.
+    For every weekmask and country in use, the cumulative number of business days since the first day
+    of the calendar is computed once, and a count is the difference of two entries of it.
+    The calendar grows when asked about dates outside of it.
+    """
+
+    holidays: pd.DataFrame
+    first: np.datetime64
+    last: np.datetime64
+    cumulative: dict[tuple[str, str], np.ndarray]
+
+    def __init__(self, holidays: pd.DataFrame = pd.DataFrame(columns=["Date", "Country"])) -> None:
+        self.holidays = pd.DataFrame({"Date": pd.to_datetime(holidays["Date"]), "Country": holidays["Country"]})
+        self.first = np.datetime64("2000-01-01", "D")
+        self.last = np.datetime64("2000-01-01", "D")
+        self.cumulative = {}
+
+    def countryHolidays(self, country: str) -> np.ndarray:
+        """The holidays of the country, including those of every country"""
+        holidays = self.holidays[self.holidays["Country"].isin(["", country])]
+        return holidays["Date"].to_numpy(dtype="datetime64[D]")
+
+    def cumulativeDays(self, weekmask: str = WEEKMASK, country: str = "") -> np.ndarray:
+        """Business days from the first day of the calendar up to each day, with a leading zero"""
+        if (weekmask, country) not in self.cumulative:
+            days = np.arange(self.first, self.last + 1, dtype="datetime64[D]")
+            business = np.is_busday(days, weekmask=weekmask, holidays=self.countryHolidays(country))
+            self.cumulative[(weekmask, country)] = np.concatenate([[0], np.cumsum(business)])
+        return self.cumulative[(weekmask, country)]
+
+    def extend(self, first: np.datetime64, last: np.datetime64) -> None:
+        """Makes the calendar cover the days from first to last, a whole year at a time"""
+        if first < self.first or last > self.last:
+            self.first = min(self.first, first.astype("datetime64[Y]").astype("datetime64[D]"))
+            self.last = max(self.last, (last.astype("datetime64[Y]") + 1).astype("datetime64[D]") - 1)
+            self.cumulative = {}
+
+    def count(
+        self,
+        from_dates,
+        to_dates,
+        weekmask: Union[str, np.ndarray, pd.Series] = WEEKMASK,
+        country: Union[str, np.ndarray, pd.Series] = "",
+    ) -> np.ndarray:
+        """
+        Business days from each from date to the to date, both included, as np.busday_count from the from date
+        to the day after the to date. The weekmask and the country are one for all or one per pair of dates.
+        """
+        from_days = np.atleast_1d(np.asarray(from_dates, dtype="datetime64[D]"))
+        to_days = np.atleast_1d(np.asarray(to_dates, dtype="datetime64[D]")) + 1
+        from_days, to_days, weekmasks, countries = np.broadcast_arrays(
+            from_days, to_days, np.asarray(weekmask, dtype=object), np.asarray(country, dtype=object)
+        )
+        if from_days.size == 0:
+            return np.zeros(0, dtype=int)
+        if np.isnat(from_days).any() or np.isnat(to_days).any():
+            raise ValueError("Cannot count business days from or to NaT")
+        self.extend(min(from_days.min(), to_days.min()), max(from_days.max(), to_days.max()) + 1)
+        start = (from_days - self.first).astype(int)
+        stop = (to_days - self.first).astype(int)
+        result = np.zeros(from_days.shape, dtype=int)
+        for weekmask, country in set(zip(weekmasks, countries)):
+            rows = (weekmasks == weekmask) & (countries == country)
+            cumulative = self.cumulativeDays(weekmask, country)
+            forwards = cumulative[stop[rows]] - cumulative[start[rows]]
+            # Like np.busday_count, a count backwards is negative and includes the from date but not the to date
+            backwards = cumulative[stop[rows] + 1] - cumulative[start[rows] + 1]
+            result[rows] = np.where(stop[rows] >= start[rows], forwards, backwards)
+        return result
+
+    def countRows(self, rows: pd.DataFrame, from_dates, to_dates) -> np.ndarray:
+        """As count(), with the Weekmask and Country columns of the rows when they have them"""
+        weekmask = rows["Weekmask"].to_numpy() if "Weekmask" in rows else WEEKMASK
+        country = rows["Country"].to_numpy() if "Country" in rows else ""
+        return self.count(from_dates, to_dates, weekmask, country)
@@ -8,6 +8,31 @@ import os
 TEMPO_CONFIG_PATH = os.environ.get("TEMPO_CONFIG_PATH", "/tempo")
 TEMPO_DAILY_HOURS = os.environ.get("TEMPO_DAILY_HOURS", 8)
 
+# Local cache for fetched data, an empty path keeps everything in memory
+TEMPO_CACHE_PATH = os.environ.get("TEMPO_CACHE_PATH", "")
+TEMPO_RECONCILE_DAYS = int(os.environ.get("TEMPO_RECONCILE_DAYS", 60))
+TEMPO_FULL_SYNC_DAYS = int(os.environ.get("TEMPO_FULL_SYNC_DAYS", 7))
+# Hours before the whole Jira user directory is fetched again
+TEMPO_USER_CACHE_MAX_AGE = float(os.environ.get("TEMPO_USER_CACHE_MAX_AGE", 24))
+# Processed data of the same day younger than this (hours) is used as is at startup, without fetching anything.
+# Half the default refresh interval, so a restarted instance starts with data no older than a running one shows
+TEMPO_CACHE_MAX_AGE = float(os.environ.get("TEMPO_CACHE_MAX_AGE", 0.5))
+# Hours between background refreshes of all data and figures, 0 disables refreshing
+TEMPO_REFRESH_INTERVAL = float(os.environ.get("TEMPO_REFRESH_INTERVAL", 1))
+
+# Keep only the used worklog fields, with the hours as float32
+TEMPO_LEAN_MODE = os.environ.get("TEMPO_LEAN_MODE", "False") == "True"
+# MB the processed frames may use, a refresh using more fails and keeps the previous data, at startup it is logged.
+# 0 disables the check
+TEMPO_MEMORY_BUDGET = float(os.environ.get("TEMPO_MEMORY_BUDGET", 0))
+
+# Number of sources fetched concurrently at startup
+TEMPO_INGEST_WORKERS = int(os.environ.get("TEMPO_INGEST_WORKERS", 8))
+
+# Record the API responses to, or replay them from, a snapshot file
+TEMPO_SNAPSHOT_MODE = os.environ.get("TEMPO_SNAPSHOT_MODE", "")
+TEMPO_SNAPSHOT_PATH = os.environ.get("TEMPO_SNAPSHOT_PATH", "snapshot.json.gz")
+
 TEMPO_LOG_LEVEL = os.environ.get("TEMPO_LOG_LEVEL", "WARNING")
 if TEMPO_LOG_LEVEL in ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]:
     logging.basicConfig(level=logging.getLevelName(TEMPO_LOG_LEVEL))
@@ -17,6 +42,7 @@ else:
 NOTION_KEY = os.environ.get("NOTION_KEY", "")
 NOTION_FINANCIAL_DATABASE_ID = os.environ.get("NOTION_FINANCIAL_DATABASE_ID", "")
 NOTION_WORKINGHOURS_DATABASE_ID = os.environ.get("NOTION_WORKINGHOURS_DATABASE_ID", "")
+NOTION_HOLIDAYS_DATABASE_ID = os.environ.get("NOTION_HOLIDAYS_DATABASE_ID", "")
 NOTION_ALLOCATION_DATABASE_ID = os.environ.get("NOTION_ALLOCATIONS_DATABASE_ID", "")
 NOTION_CREW_DATABASE_ID = os.environ.get("NOTION_CREW_DATABASE_ID", "")
 NOTION_DEFAULT_RATES_DATABASE_ID = os.environ.get("NOTION_DEFAULT_RATES_DATABASE_ID", "")
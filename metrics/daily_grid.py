@@ -0,0 +1,182 @@
+"""Daily sums per user as dense NumPy arrays"""
+
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+def prefixSum(array: np.ndarray, previous: Optional[np.ndarray] = None, since: int = 0) -> np.ndarray:
+    """
+    Cumulative sum along the last axis with a leading zero, so that a window is the difference of two entries.
+    The entries of previous up to day since are kept, and only the days from there on are summed.
+    """
+    if previous is None or since == 0:
+        return np.cumsum(np.concatenate([np.zeros(array.shape[:-1] + (1,)), array], axis=-1), axis=-1)
+    tail = np.cumsum(np.concatenate([previous[..., since : since + 1], array[..., since:]], axis=-1), axis=-1)
+    return np.concatenate([previous[..., :since], tail], axis=-1)
+
+
+def windowSum(cumulative: np.ndarray, days: int) -> np.ndarray:
+    """Sum over the last days of every day, including the current day, from the prefix sums of prefixSum()"""
+    day = np.arange(cumulative.shape[-1] - 1)
+    return cumulative[..., day + 1] - cumulative[..., np.maximum(day + 1 - days, 0)]
+
+
+def rollingMean(frame: pd.DataFrame, to_mean: Union[str, list[str]], days: int, min_periods: int) -> pd.DataFrame:
+    """
+    Mean of the rows of the last days of every row, like rolling(f"{days}d", min_periods).mean() over the
+    Date index of a frame sorted by Date, from prefix sums over the rows. Returns Date and the means.
+    Rows can share a date, a row then only averages the rows before it, like pandas.
+    """
+    columns = [to_mean] if isinstance(to_mean, str) else list(to_mean)
+    dates = frame["Date"].to_numpy()
+    start = np.searchsorted(dates, dates - np.timedelta64(days, "D"), side="right")
+    stop = np.arange(1, len(dates) + 1)
+    values = frame[columns].to_numpy(dtype=float).T
+    # Like pandas, infinite values are left out as NaN
+    valid = np.isfinite(values)
+    cumulative = prefixSum(np.where(valid, values, 0))
+    cumulative_count = prefixSum(valid.astype(int))
+    count = cumulative_count[:, stop] - cumulative_count[:, start]
+    means = (cumulative[:, stop] - cumulative[:, start]) / np.where(count >= max(min_periods, 1), count, np.nan)
+    return pd.DataFrame({"Date": frame["Date"].to_numpy(), **dict(zip(columns, means))})
+
+
+class DailyGrid:
+    """
+    Daily sums of the worklogs in users × days arrays, built in one pass over the data.
+
+    A day is present for a user if the user has worklogs that day, or if the day is within
+    one of the user's padding periods. Rolling sums need every day of the window to be present,
+    like a 7d rolling window with min_periods=7 over one row per present day.
+
+    Rolling sums of any length are differences of prefix sums. Given the grid of the previous refresh
+    and the first day whose worklogs may have changed since, the days before it are kept from the previous
+    grid, and only the worklogs and padding from that day on are summed again.
+    The caller records what the grid was built from in inputs and synced, see TempoData.buildGrid().
+    """
+
+    users: pd.Index
+    dates: pd.DatetimeIndex
+    values: dict[str, np.ndarray]
+    present: np.ndarray
+    cumulative: dict[str, np.ndarray]
+    cumulative_present: np.ndarray
+    since: int
+    inputs: str
+    synced: int
+
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        columns: list[str],
+        padding: pd.DataFrame,
+        previous: Optional["DailyGrid"] = None,
+        since: Optional[str] = None,
+        inputs: str = "",
+        synced: int = 0,
+    ) -> None:
+        """
+        data has User, Date and the columns to sum, padding has User, Start and Stop per period.
+        previous is only reused up to the day since if it was built from the same inputs.
+        """
+        padding = padding[padding["User"].isin(data["User"]) & (padding["Start"] <= padding["Stop"])]
+        self.users = pd.Index(sorted(data["User"].unique()))
+        first = min(data["Date"].min(), padding["Start"].min()) if not padding.empty else data["Date"].min()
+        last = max(data["Date"].max(), padding["Stop"].max()) if not padding.empty else data["Date"].max()
+        self.dates = pd.date_range(first, last)
+        self.inputs = inputs
+        self.synced = synced
+        self.since = self.reusedDays(previous, columns, since)
+        reused = previous if self.since > 0 else None
+
+        # Only the worklogs and periods from day since on are summed
+        shape = (len(self.users), len(self.dates) - self.since)
+        start = first + pd.Timedelta(days=self.since)
+        data = data[data["Date"] >= start]
+        user = self.users.get_indexer(data["User"])
+        day = ((data["Date"] - start) // pd.Timedelta(days=1)).to_numpy()
+        cell = user * shape[1] + day
+        size = shape[0] * shape[1]
+        values = {
+            column: np.bincount(cell, weights=data[column].fillna(0).to_numpy(), minlength=size).reshape(shape)
+            for column in columns
+        }
+
+        # Periods are marked with +1 at the start and -1 after the stop, the cumulative sum covers them
+        padding = padding[padding["Stop"] >= start]
+        marks = np.zeros((shape[0], shape[1] + 1), dtype=int)
+        np.add.at(marks, (self.users.get_indexer(padding["User"]), (padding["Start"] - start).dt.days.clip(0)), 1)
+        np.add.at(marks, (self.users.get_indexer(padding["User"]), (padding["Stop"] - start).dt.days + 1), -1)
+        present = marks.cumsum(axis=1)[:, :-1] > 0
+        present.flat[cell] = True
+
+        # The arrays of the previous grid are copied, they are still in use by the previous snapshot
+        self.values = {
+            column: np.concatenate([reused.values[column][:, : self.since], values[column]], axis=1)
+            if reused
+            else values[column]
+            for column in columns
+        }
+        self.present = np.concatenate([reused.present[:, : self.since], present], axis=1) if reused else present
+        self.cumulative = {
+            column: prefixSum(self.values[column], reused.cumulative[column] if reused else None, self.since)
+            for column in columns
+        }
+        self.cumulative_present = prefixSum(
+            self.present.astype(int), reused.cumulative_present if reused else None, self.since
+        )
+
+    def reusedDays(self, previous: Optional["DailyGrid"], columns: list[str], since: Optional[str]) -> int:
+        """
+        The days kept from previous, those before since, or 0 unless previous has the same inputs, users,
+        start and columns
+        """
+        if (
+            previous is None
+            or since is None
+            or not self.inputs
+            or self.inputs != previous.inputs
+            or not self.users.equals(previous.users)
+            or self.dates[0] != previous.dates[0]
+            or list(previous.values) != columns
+        ):
+            return 0
+        days = (pd.Timestamp(since) - self.dates[0]) // pd.Timedelta(days=1)
+        return int(np.clip(days, 0, min(len(self.dates), len(previous.dates))))
+
+    def complete(self, days: int) -> np.ndarray:
+        """Whether all days of the window of every user and day are present"""
+        return windowSum(self.cumulative_present, days) == days
+
+    def userRolling(self, to_sum: Union[str, list[str]], days: int = 7) -> pd.DataFrame:
+        """Rolling sums per user and present day, NaN unless all days of the window are present"""
+        columns = [to_sum] if isinstance(to_sum, str) else to_sum
+        complete = self.complete(days)
+        user, day = np.nonzero(self.present)
+        result = pd.DataFrame({"User": self.users[user], "Date": self.dates[day]})
+        for column in columns:
+            rolling = np.where(complete, windowSum(self.cumulative[column], days), np.nan)
+            result[column] = rolling[user, day]
+        return result
+
+    def teamDaily(self, to_sum: Union[str, list[str]]) -> pd.DataFrame:
+        """Daily sums of the whole team for the days present for any user"""
+        columns = [to_sum] if isinstance(to_sum, str) else to_sum
+        present = self.present.any(axis=0)
+        result = pd.DataFrame({"Date": self.dates[present]})
+        for column in columns:
+            result[column] = self.values[column].sum(axis=0)[present]
+        return result
+
+    def teamRolling(self, to_sum: Union[str, list[str]], days: int = 7) -> pd.DataFrame:
+        """Rolling sums of the whole team, NaN unless all days of the window are present for some user"""
+        columns = [to_sum] if isinstance(to_sum, str) else to_sum
+        present = self.present.any(axis=0)
+        complete = windowSum(prefixSum(present.astype(int)), days) == days
+        result = pd.DataFrame({"Date": self.dates[present]})
+        for column in columns:
+            rolling = np.where(complete, windowSum(self.cumulative[column].sum(axis=0), days), np.nan)
+            result[column] = rolling[present]
+        return result
@@ -1,25 +1,46 @@
 """Various date utility functions"""
 
+from typing import Optional
+
 import numpy as np
 import pandas as pd
 
+from metrics.api_snapshot import api_snapshot
+
 
 def weekdays(from_date: str, to_date: str):
     """Returns the number of weekdays between the dates using np"""
     return np.busday_count(from_date, str(lookAhead(1, to_date).date()), weekmask="1111100")
 
 
-def lookAhead(offset: int, from_date: str = pd.Timestamp.today()):
-    return pd.Timestamp(from_date).floor("D") + pd.offsets.Day(offset)
+# Without a date these count from today, read on every call as tempo_config.today() does,
+# which cannot be imported here as tempo_config imports this module
+
+
+def lookAhead(offset: int, from_date: Optional[str] = None):
+    return pd.Timestamp(from_date or api_snapshot.today()).floor("D") + pd.offsets.Day(offset)
 
 
-def lookBack(offset: int, from_date: str = pd.Timestamp.today()):
-    return pd.Timestamp(from_date).floor("D") - pd.offsets.Day(offset)
+def lookBack(offset: int, from_date: Optional[str] = None):
+    return pd.Timestamp(from_date or api_snapshot.today()).floor("D") - pd.offsets.Day(offset)
 
 
-def monthBegin(from_date: str = pd.Timestamp.today()):
+def monthBegin(from_date: Optional[str] = None):
     """Return with the first for the date"""
-    return pd.Timestamp(from_date).strftime("%Y-%m-01")
+    return pd.Timestamp(from_date or api_snapshot.today()).strftime("%Y-%m-01")
+
+
+def dateBounds(dates: np.ndarray, after=None, until=None) -> tuple[int, int]:
+    """Returns the positions from and to which the sorted dates are after and until the given dates"""
+    start = 0 if after is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(after)), side="right")
+    stop = len(dates) if until is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(until)), side="right")
+    return int(start), int(stop)
+
+
+def dateSlice(frame: pd.DataFrame, after=None, until=None) -> pd.DataFrame:
+    """Returns the rows of a frame sorted by Date with after < Date <= until"""
+    start, stop = dateBounds(frame["Date"].to_numpy(), after, until)
+    return frame.iloc[start:stop]
 
 
 def leapYear(year: int) -> bool:
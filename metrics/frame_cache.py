@@ -0,0 +1,128 @@
+"""Persistent cache of the processed DataFrames, stored as Arrow files"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    feather = None
+
+FRAME_CACHE_VERSION = 1
+KEEP_ENTRIES = 2
+
+
+def codeVersion() -> str:
+    """Hash of the metrics sources and the pandas version, any change invalidates the cache"""
+    digest = hashlib.sha256(f"{FRAME_CACHE_VERSION} {pd.__version__}".encode())
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(__file__), "*.py"))):
+        with open(path, "rb") as fh:
+            digest.update(fh.read())
+    return digest.hexdigest()[:16]
+
+
+CODE_VERSION = codeVersion()
+
+
+def inputHash(frames: dict[str, pd.DataFrame], run_date: str = "") -> str:
+    """Hash of the input frames, the day they are processed on and the code version"""
+    digest = hashlib.sha256(f"{CODE_VERSION} {run_date}".encode())
+    for name, frame in sorted(frames.items()):
+        digest.update(name.encode())
+        digest.update(",".join(map(str, frame.columns)).encode())
+        if not frame.empty:
+            digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+    return digest.hexdigest()[:32]
+
+
+class FrameCache:
+    """
+    Processed frames keyed by the hash of their inputs, in `<path>/frames/<key>/<name>.arrow`.
+
+    Frames are written as uncompressed Arrow IPC files so they can be memory mapped when read.
+    The cache is disabled without a path or when pyarrow is not installed.
+    """
+
+    path: Optional[str]
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = os.path.join(path, "frames") if path else None
+        if self.path and feather is None:
+            logging.info("pyarrow is not installed, the frame cache is disabled")
+            self.path = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def manifest(self) -> dict:
+        if self.path is None:
+            return {}
+        try:
+            with open(os.path.join(self.path, "manifest.json"), encoding="utf-8") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, key: str) -> Optional[dict[str, pd.DataFrame]]:
+        """Returns the frames stored under key, or None"""
+        if self.path is None:
+            return None
+        entry = os.path.join(self.path, key)
+        if not os.path.isdir(entry):
+            return None
+        frames = {}
+        for path in glob.glob(os.path.join(entry, "*.arrow")):
+            name = os.path.splitext(os.path.basename(path))[0]
+            frames[name] = feather.read_table(path, memory_map=True).to_pandas()
+        logging.info("Loaded %s frames from %s", len(frames), entry)
+        return frames
+
+    def latest(self, max_age: pd.Timedelta, run_date: str = "") -> Optional[dict[str, pd.DataFrame]]:
+        """
+        Returns the newest frames stored by this code version if they are younger than max_age
+        and were processed on run_date
+        """
+        if not self.enabled:
+            return None
+        latest = self.manifest().get(CODE_VERSION)
+        if latest is None or pd.Timestamp.utcnow() - pd.Timestamp(latest["created"]) > max_age:
+            return None
+        if latest.get("run_date", "") != run_date:
+            return None
+        return self.load(latest["key"])
+
+    def store(self, key: str, frames: dict[str, pd.DataFrame], run_date: str = "") -> None:
+        """Stores the frames under key and drops all but the newest entries"""
+        if self.path is None:
+            return
+        entry = os.path.join(self.path, key)
+        tmp_entry = f"{entry}.tmp"
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        os.makedirs(tmp_entry)
+        for name, frame in frames.items():
+            table = pa.Table.from_pandas(frame, preserve_index=True)
+            feather.write_feather(table, os.path.join(tmp_entry, f"{name}.arrow"), compression="uncompressed")
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp_entry, entry)
+
+        manifest = self.manifest()
+        history = [old for old in manifest.get("history", []) if old != key] + [key]
+        for old in history[:-KEEP_ENTRIES]:
+            shutil.rmtree(os.path.join(self.path, old), ignore_errors=True)
+        manifest["history"] = history[-KEEP_ENTRIES:]
+        manifest[CODE_VERSION] = {"key": key, "created": str(pd.Timestamp.utcnow()), "run_date": run_date}
+        tmp_manifest = os.path.join(self.path, "manifest.json.tmp")
+        with open(tmp_manifest, "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh)
+        os.replace(tmp_manifest, os.path.join(self.path, "manifest.json"))
+        logging.info("Stored %s frames in %s", len(frames), entry)
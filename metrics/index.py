@@ -1,35 +1,40 @@
 """The metrics module."""
 
+import functools
 import logging
 import os
-from datetime import date, datetime
+import threading
+from datetime import datetime
+from typing import NamedTuple, Optional
 
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from dash import dcc, html
 
-from metrics.constants import *
-from metrics.date_utils import lookBack
-from metrics.notion import (
-    Allocations,
-    Crew,
-    Financials,
-    RatesDefault,
-    RatesExceptions,
-    RatesInternal,
-    WorkingHours,
+from metrics.allocation_timeline import (
+    ALLOCATION_COLORS,
+    allocationColor,
+    allocationTimeline,
 )
+from metrics.api_snapshot import api_snapshot
+from metrics.business_calendar import WEEKMASK, BusinessCalendar
+from metrics.constants import *
+from metrics.daily_grid import DailyGrid, rollingMean
+from metrics.frame_cache import FrameCache, inputHash
+from metrics.ingest import ingest
+from metrics.jira_data import IssueResolver, UserDirectory
+from metrics.memory import MemoryReport
 from metrics.supplementary_data import SupplementaryData
 
 # fmt: off
 from metrics.tempo_config import (
-    ALLOCATION_START,
     EUR2SEK,
-    ROLLING_DATE,
     START_DATE,
-    TODAY,
-    YESTERDAY,
+    allocationStart,
+    rollingDate,
+    today,
+    yesterday,
 )
 
 # fmt: on
@@ -45,6 +50,7 @@ from metrics.tempo_figures import (
     figureRollingTotal,
     figureSpentTimePercentage,
 )
+from metrics.worklog_store import WorklogStore
 
 # happy hack until we can fix these
 pd.options.mode.chained_assignment = None  # default='warn'
@@ -59,34 +65,37 @@ def teamRollingAverage7(frame, to_mean):
 
 
 def rollingAverage(frame, to_mean, days, offset=7):
-    return (
-        frame.set_index("Date")
-        .rolling(str(days) + "d", min_periods=days - offset)[to_mean]
-        .mean()
-        .reset_index(inplace=False)
-    )
+    return rollingMean(frame, to_mean, days, days - offset)
 
 
-def normaliseUserRolling7(frame, working_hours_data):
-    first_date = START_DATE
-    last_date = TODAY
+def normaliseUserRolling7(frame, working_hours_data, calendar=None):
+    """The rolling sums as % of the working hours in the business days of the week up to each date"""
+    calendar = calendar or BusinessCalendar()
     result = frame
     result["Daily"] = float(TEMPO_DAILY_HOURS)
+    week = pd.DataFrame({"Weekmask": WEEKMASK, "Country": ""}, index=result.index)
     if not working_hours_data.empty:
-        for _, row in working_hours_data.iterrows():
-            if row["Daily"] != float(TEMPO_DAILY_HOURS):
-                logging.debug("%s %s", row["User"], row["Daily"])
-                if row["Start"] != "*":
-                    first_date = row["Start"]
-                if row["Stop"] != "*":
-                    last_date = row["Stop"]
-                result.loc[
-                    (result["User"] == row["User"]) & (result["Date"] >= first_date) & (result["Date"] <= last_date),
-                    "Daily",
-                ] = row["Daily"]
-
-    result["%-billable"] = 100 * (result["Billable"] / (5 * result["Daily"]))
-    result["%-internal"] = 100 * (result["Internal"] / (5 * result["Daily"]))
+        # Every date takes the Daily of the user's working hours with the latest Start on or before it, if not stopped
+        rules = pd.DataFrame(
+            {
+                "User": working_hours_data["User"],
+                "Start": pd.to_datetime(working_hours_data["Start"].replace("*", START_DATE)),
+                "Stop": pd.to_datetime(working_hours_data["Stop"].replace("*", today())),
+                "Rule": working_hours_data["Daily"].astype(float),
+                "Weekmask": working_hours_data.get("Weekmask", WEEKMASK),
+                "Country": working_hours_data.get("Country", ""),
+            }
+        ).sort_values(by="Start", kind="stable")
+        dated = result[["User", "Date"]].reset_index().sort_values(by="Date", kind="stable")
+        dated = pd.merge_asof(dated, rules, left_on="Date", right_on="Start", by="User").set_index("index")
+        applies = dated["Date"] <= dated["Stop"]
+        result["Daily"] = dated["Rule"].where(applies).reindex(result.index).fillna(float(TEMPO_DAILY_HOURS))
+        week = dated[["Weekmask", "Country"]].where(applies).reindex(result.index).fillna(week)
+
+    days = calendar.countRows(week, result["Date"] - pd.Timedelta(days=6), result["Date"])
+    hours = (days * result["Daily"]).where(days > 0)
+    result["%-billable"] = 100 * (result["Billable"] / hours)
+    result["%-internal"] = 100 * (result["Internal"] / hours)
 
     return result
 
@@ -123,157 +132,95 @@ def delta(txt):
     logging.info("%s: %s", diff, txt)
 
 
-# ---------------------------------------------------------
-# Data from NOTION
-if NOTION_KEY and NOTION_FINANCIAL_DATABASE_ID:
-    financials = Financials(NOTION_KEY, NOTION_FINANCIAL_DATABASE_ID)
-    financials.get_financials()
-    financials_df = financials.data
-else:
-    financials_df = pd.DataFrame()
-
-delta("Notion Financials")
-
-if NOTION_KEY and NOTION_WORKINGHOURS_DATABASE_ID:
-    working_hours = WorkingHours(NOTION_KEY, NOTION_WORKINGHOURS_DATABASE_ID)
-    working_hours.get_workinghours()
-    working_hours_df = working_hours.data
-else:
-    working_hours_df = pd.DataFrame()
-
-delta("Notion working Hours")
-
-if NOTION_KEY and NOTION_ALLOCATION_DATABASE_ID:
-    allocations = Allocations(NOTION_KEY, NOTION_ALLOCATION_DATABASE_ID)
-    allocations.get_allocations()
-    allocations_df = allocations.data
-else:
-    allocations_df = pd.DataFrame()
-
-delta("Notion Allocations")
-
-if NOTION_KEY and NOTION_CREW_DATABASE_ID:
-    crew = Crew(NOTION_KEY, NOTION_CREW_DATABASE_ID)
-    crew.get_crew()
-    crew_df = crew.data
-else:
-    crew_df = pd.DataFrame()
-
-delta("Notion Crew")
-
-if NOTION_KEY and NOTION_DEFAULT_RATES_DATABASE_ID:
-    default_rates = RatesDefault(NOTION_KEY, NOTION_DEFAULT_RATES_DATABASE_ID)
-    default_rates.get_rates()
-    default_rates_df = default_rates.data
-else:
-    default_rates_df = pd.DataFrame()
-
-if NOTION_KEY and NOTION_EXCEPTIONS_RATES_DATABASE_ID:
-    exceptional_rates = RatesExceptions(NOTION_KEY, NOTION_EXCEPTIONS_RATES_DATABASE_ID)
-    exceptional_rates.get_rates()
-    exceptional_rates_df = exceptional_rates.data
-else:
-    exceptional_rates_df = pd.DataFrame()
-
-if NOTION_KEY and NOTION_INTERNAL_RATES_DATABASE_ID:
-    internal_keys = RatesInternal(NOTION_KEY, NOTION_INTERNAL_RATES_DATABASE_ID)
-    internal_keys.get_rates()
-    internal_keys_df = internal_keys.data
-else:
-    internal_keys_df = pd.DataFrame()
-
-delta("Notion Rates")
-
-# ---------------------------------------------------------
-# Data from TEMPO
-
-tempo = TempoData()
-tempo.load(from_date=START_DATE, to_date=YESTERDAY, crew=crew_df)
-delta("TempoData")
-
-supplementary = SupplementaryData(financials_df, working_hours_df, default_rates_df, exceptional_rates_df)
-supplementary.load(tempo.getUsers())
-delta("Supplementary Data")
-
-tempo.zeroOutBillableTime(internal_keys_df)
-delta("ZeroOutBillable")
-
-if not supplementary.rates.empty:
-    tempo.injectRates(supplementary.rates)
-    delta("InjectRates")
-    table_rates = tempo.ratesTable(tableHeight, COLOR_HEAD, COLOR_ONE)
-    delta("Table Rates")
-    table_missing_rates = tempo.missingRatesTable(tableHeight, COLOR_HEAD, COLOR_ONE)
-    delta("Table Missing Rates")
-
-if not supplementary.working_hours.empty:
-    tempo.padTheData(supplementary.working_hours)
-    delta("Data Padding")
-
-# a quick test
-td = tempo.data[tempo.data["Income"] > 0]
-print(td)
-print(pd.Timestamp("today").strftime("%Y-%m-01"))
-print(lookBack(180).strftime("%Y-%m-01"))
-td = td[td["Date"] >= lookBack(180).strftime("%Y-%m-01")]
-td["Month"] = td["Date"].dt.month
-print(td)
-print(td.groupby(["Year", "Month", "Key"], as_index=False)["Income"].sum())
-# =========================================================
-# Table: User working hours
-# =========================================================
+# The local caches would make the recorded API calls depend on the previous run
+cache_path = "" if api_snapshot.active else TEMPO_CACHE_PATH
+frame_cache = FrameCache(cache_path)
+worklog_store = WorklogStore(cache_path)
+issue_resolver = IssueResolver(cache_path)
+user_directory = UserDirectory(cache_path, TEMPO_USER_CACHE_MAX_AGE)
+
+
+def loadData(warm_start=False, report=None, previous_grid=None):
+    """
+    Fetches the data from NOTION and TEMPO concurrently and processes it.
+    Returns tempo, supplementary, allocations and crew data.
+    The memory used after each stage is recorded in report.
+    The daily sums of previous_grid, from the last refresh, are reused up to the first day that changed.
+    """
+    report = report if report is not None else MemoryReport()
+    # The processing depends on the day it runs, through yesterday() and the rolling windows
+    run_date = str(today().date())
+    # A recent enough processed data set of the same day is used at startup without fetching anything
+    cached_frames = frame_cache.latest(pd.Timedelta(hours=TEMPO_CACHE_MAX_AGE), run_date) if warm_start else None
+    # The grid is only patched if the data was processed with the same Notion data, unknown for cached frames
+    grid_inputs = ""
+    if cached_frames is None:
+        tempo = TempoData(
+            worklog_store=worklog_store,
+            issue_resolver=issue_resolver,
+            user_directory=user_directory,
+            lean=TEMPO_LEAN_MODE,
+        )
+        sources = ingest(tempo, from_date=START_DATE, to_date=yesterday())
+        financials_df = sources["financials"]
+        working_hours_df = sources["working_hours"]
+        allocations_df = sources["allocations"]
+        crew_df = sources["crew"]
+        default_rates_df = sources["default_rates"]
+        exceptional_rates_df = sources["exceptional_rates"]
+        currency_rates_df = sources["currency_rates"]
+        holidays_df = sources["holidays"]
+        delta("Notion and TempoData")
+        report.record("Ingest", {**tempo.frames(), **sources})
+        report.check()
+
+        # Unchanged inputs are not processed again
+        inputs_key = inputHash({"tempo": tempo.data, **sources}, run_date)
+        grid_inputs = inputHash(sources)
+        cached_frames = frame_cache.load(inputs_key)
+
+    if cached_frames is None:
+        supplementary = SupplementaryData(
+            financials_df, working_hours_df, default_rates_df, exceptional_rates_df, currency_rates_df, holidays_df
+        )
+        supplementary.load(tempo.getUsers())
+        delta("Supplementary Data")
+
+        if not supplementary.rates.empty:
+            tempo.injectRates(supplementary.rates, supplementary.currency_rates, supplementary.exceptional_rates)
+            delta("InjectRates")
+
+        if not supplementary.working_hours.empty:
+            tempo.buildGrid(supplementary.working_hours, previous_grid, grid_inputs)
+            delta("Daily Grid")
+
+        processed_frames = {
+            "data": tempo.data,
+            "working_hours": supplementary.working_hours,
+            "rates": supplementary.rates,
+            "exceptional_rates": supplementary.exceptional_rates,
+            "holidays": supplementary.holidays,
+            "costs": supplementary.costs,
+            "raw_costs": supplementary.raw_costs,
+            "allocations": allocations_df,
+            "crew": crew_df,
+        }
+        report.record("Processed", {**tempo.frames(), **processed_frames})
+        report.check()
+        frame_cache.store(inputs_key, processed_frames, run_date)
+        delta("Frame Cache Stored")
+    else:
+        tempo = TempoData.fromFrames(cached_frames["data"], worklog_store if grid_inputs else None)
+        supplementary = SupplementaryData.fromFrames(cached_frames)
+        if not supplementary.working_hours.empty:
+            tempo.buildGrid(supplementary.working_hours, previous_grid, grid_inputs)
+        allocations_df = cached_frames["allocations"]
+        crew_df = cached_frames["crew"]
+        delta("Frame Cache Loaded")
+        report.record("Cached", {**tempo.frames(), **cached_frames})
+        report.check()
 
-
-table_working_hours = tempo.tableByUser(supplementary.working_hours, tableHeight, COLOR_HEAD, COLOR_ONE)
-delta("Table Working Hours")
-last_reported = pd.to_datetime(min(tempo.byUser(supplementary.working_hours)["Last"]))
-logging.info("Last common day: %s", last_reported)
-
-if not supplementary.working_hours.empty:
-    df_user_time_rolling = tempo.userRolling7(["Billable", "Internal"])
-    delta("User Time Rolling")
-    df_user_normalised = normaliseUserRolling7(df_user_time_rolling, supplementary.working_hours)
-    delta("User Normalised")
-    df_team_normalised = normaliseTeamAverage(df_user_normalised)
-    delta("Team Normalised")
-    if not supplementary.rates.empty:
-        df_user_income_rolling = tempo.userRolling7("Income")
-        delta("User Income Rolling")
-        # Average user data
-        df_average_income_rolling_7 = teamRollingAverage7(df_user_income_rolling, "Income")
-        df_average_income_rolling_30 = rollingAverage(df_average_income_rolling_7, "Income", 30)
-        df_average_income_rolling_30.columns = ["Date", "Income30"]
-        df_average_income_rolling_30 = df_average_income_rolling_30.merge(df_average_income_rolling_7, on=["Date"])
-        delta("Average Income Rolling")
-        # Team total data
-        df_team_income_rolling = tempo.teamRolling7("Income")
-        df_team_income_rolling_30 = rollingAverage(df_team_income_rolling, "Income", 30)
-        df_team_income_rolling_30.columns = ["Date", "Income30"]
-        df_team_income_rolling_30 = df_team_income_rolling_30.merge(df_team_income_rolling, on=["Date"])
-        df_team_rolling_total = df_team_income_rolling_30
-        delta("User Income Rolling")
-        # data for rolling earnings
-        if not supplementary.costs.empty:
-            df_team_earn_rolling = tempo.teamRolling7Relative(supplementary.costs)
-            df_team_earn_rolling_30 = rollingAverage(df_team_earn_rolling, "Diff", 30)
-            df_team_earn_rolling_30.columns = ["Date", "Diff30"]
-            df_team_earn_rolling_30 = df_team_earn_rolling_30.merge(df_team_earn_rolling, on=["Date"])
-            df_team_earn_rolling_365 = rollingAverage(df_team_earn_rolling, "Diff", 365)
-            df_team_earn_rolling_365.columns = ["Date", "Diff365"]
-            df_team_earn_rolling_365 = df_team_earn_rolling_365.merge(df_team_earn_rolling_30, on=["Date"])
-            df_team_earn_rolling_total = df_team_earn_rolling_365
-            df_team_earn_rolling_total.rename(
-                columns={
-                    "Diff": "Rolling Weekly Average",
-                    "Diff30": "Rolling Monthly Average",
-                    "Diff365": "Rolling Yearly Average",
-                },
-                inplace=True,
-            )
-            delta("Team Earning Rolling")
-            # Comparing normalized worktime with normalized income
-            df_comparison = df_team_earn_rolling_total.merge(df_team_normalised, how="inner", on="Date")
-            delta("Comparison")
+    return tempo, supplementary, allocations_df, crew_df
 
 
 # =========================================================
@@ -281,95 +228,15 @@ if not supplementary.working_hours.empty:
 # =========================================================
 # Requires config: rates
 def figureAllocations(allocation_data):
+    allocation_start = allocationStart()
     allocation_data["Start"] = pd.to_datetime(allocation_data["Start"])
     allocation_data["Stop"] = pd.to_datetime(allocation_data["Stop"])
     allocation_data["Allocation"] = pd.to_numeric(allocation_data["Allocation"], errors="coerce")
-    allocation_data = allocation_data[allocation_data["Stop"] >= ALLOCATION_START]
-    allocation_data.loc[allocation_data["Start"] <= ALLOCATION_START, "Start"] = ALLOCATION_START
-
-    # Create a list to store rows for each day
-    rows = []
-
-    for _, row in allocation_data.iterrows():
-        user = row["User"]
-        allocation = row["Allocation"]
-        unconfirmed = row["Unconfirmed"]
-        jira_id = row["JiraID"]
-
-        # Generate a date range for each day in the specified range
-        date_range = pd.date_range(start=row["Start"], end=row["Stop"], freq="D")
-
-        # Create a row for each day
-        for date in date_range:
-            rows.append(
-                {
-                    "User": user,
-                    "Date": date,
-                    "Allocation": allocation,
-                    "Unconfirmed": unconfirmed,
-                    "JiraID": jira_id,
-                }
-            )
+    allocation_data = allocation_data[allocation_data["Stop"] >= allocation_start]
+    allocation_data.loc[allocation_data["Start"] <= allocation_start, "Start"] = allocation_start
 
-    # Create a new DataFrame to group by user and date to aggregate the data
-    result_df = pd.DataFrame(rows)
-
-    result_df = (
-        result_df.groupby(["User", "Date"])
-        .agg(
-            {
-                "Allocation": "sum",
-                "Unconfirmed": "max",  # True if any day is True
-                "JiraID": lambda x: ",".join(x.unique()),  # Concatenate JiraIDs
-            }
-        )
-        .reset_index()
-    )
-
-    # Group by relevant columns and aggregate date ranges into timelines
-    allocation_data = (
-        result_df.groupby(["User", "Allocation", "Unconfirmed", "JiraID"])
-        .agg(Start=("Date", "min"), Stop=("Date", "max"))
-        .reset_index()
-    )
-
-    # Define a function to determine color based on conditions
-    def determine_color(row):
-        result = ""
-        if row["Unconfirmed"]:
-            if row["Allocation"] < 0.4:
-                result = "Unconfirmed (< 40%)"
-            elif row["Allocation"] > 0.8:
-                result = "Unconfirmed (> 80%)"
-            result = "Unconfirmed"
-        elif "?" in row["JiraID"]:
-            if row["Allocation"] < 0.4:
-                result = "Missing Jira (< 40%)"
-            elif row["Allocation"] > 0.8:
-                result = "Missing Jira (> 80%)"
-            result = "Missing Jira"
-        elif row["Allocation"] < 0.4:
-            result = "Less than 40%"
-        elif row["Allocation"] > 0.8:
-            result = "More than 80%"
-        else:
-            result = "OK"
-        return result
-
-    color_mapping = {
-        "Unconfirmed": "red",
-        "Unconfirmed (< 40%)": "lightred",
-        "Unconfirmed (> 80%)": "darkred",
-        "Missing Jira": "gray",
-        "Missing Jira (< 40%)": "lightgray",
-        "Missing Jira (> 80%)": "darkslategray",
-        "OK": "#2FB115",
-        "Less than 40%": "lightgreen",
-        "More than 80%": "darkgreen",
-    }
-
-    # Apply the function to create a new 'Color' column
-    allocation_data["Color"] = allocation_data.apply(determine_color, axis=1)
+    allocation_data = allocationTimeline(allocation_data)
+    allocation_data["Color"] = allocationColor(allocation_data)
 
     # Create a Gantt chart
     figure = px.timeline(
@@ -380,15 +247,15 @@ def figureAllocations(allocation_data):
         color="Color",
         hover_data={"JiraID": True, "Allocation": ":.0%"},  # Format Allocation as percentage
         title="Allocations by user",
-        color_discrete_map=color_mapping,  # Explicitly define color mapping
+        color_discrete_map=ALLOCATION_COLORS,  # Explicitly define color mapping
     )
 
     # Add vertical line for current date
     figure.add_shape(
         dict(
             type="line",
-            x0=TODAY,
-            x1=TODAY,
+            x0=today(),
+            x1=today(),
             y0=0,
             y1=1,
             yref="paper",
@@ -399,7 +266,7 @@ def figureAllocations(allocation_data):
     # Add text annotation above the red line
     figure.add_annotation(
         text="Today",
-        x=TODAY,
+        x=today(),
         y=1.1,
         yref="paper",
         showarrow=False,
@@ -469,7 +336,7 @@ def figureRollingEarnings(df_team_earn_rolling_total, supplementary_data, last_d
     )
     figure.update_layout(
         xaxis_rangeslider_visible=True,
-        xaxis_range=[ROLLING_DATE, str(date.today())],
+        xaxis_range=[rollingDate(), str(today().date())],
     )
     if last_day is not None:
         figure.add_vline(
@@ -510,7 +377,7 @@ def figureProjectsIndividual(grouped_data):
 
 def figureProjects(tempo_data):
     df_by_group = tempo_data.byGroup().sort_values("Group")
-    df_by_group = df_by_group[df_by_group["Date"] > ROLLING_DATE]
+    df_by_group = df_by_group[df_by_group["Date"] > rollingDate()]
     figure = px.histogram(df_by_group, x="Date", y="Time", color="Group", height=600)
     figure.update_layout(bargap=0.1, xaxis_title="", yaxis_title="Time [h]")
     figure.update_layout(
@@ -865,147 +732,330 @@ def sustainableHours(crew_data):
 
 
 # =========================================================
-# Base rendering (only requires TEMPO_KEY)
+# Snapshot
 # =========================================================
 
-delta("Starting Rendering")
-main_list = []
-main_list.append(figureEggBaskets(tempo, supplementary, crew_df))
-main_list.append(table_working_hours)
-if not supplementary.rates.empty:
-    main_list.append(table_missing_rates)
-
-# Allocations
-# Requires Notion Allocations DB
-if not allocations_df.empty:
-    [figure_allocations] = figureAllocations(allocations_df)
-    main_list.append(figure_allocations)
-delta("Allocations building")
-
-tab_children = [dcc.Tab(label="Main", value="start_page")]
-figure_tabs = {"start_page": ("Main", main_list)}
-
-if SHOWTAB_PROJECTS:
-    tab_children.append(dcc.Tab(label="Time spent on...", value="projects"))
-    figures_project = figureProjects(tempo)
-    figure_tabs["projects"] = ("What we work on", figures_project)
-if SHOWTAB_BILLABLE:
-    tab_children.append(dcc.Tab(label="Billable", value="billable"))
-    figure_tabs["billable"] = ("Billable work", figureBillable(tempo))
-if SHOWTAB_INTERNAL:
-    tab_children.append(dcc.Tab(label="Internal", value="internal"))
-    figure_tabs["internal"] = ("Internal work", figureInternal(tempo))
-if SHOWTAB_POPULAR_PROJECTS:
-    tab_children.append(dcc.Tab(label="Popular projects", value="popular_projects"))
-    figure_tabs["popular_projects"] = ("Popular projects", figurePopularProjects(tempo))
-if SHOWTAB_PAYING_PROJECTS:
+
+class Snapshot(NamedTuple):
+    """
+    Everything rendered from one refresh of the data.
+    The figures of a tab are built on first use and kept for the lifetime of the snapshot.
+    """
+
+    created: pd.Timestamp
+    figure_tabs: dict
+    tab_structure: dcc.Tabs
+    pageheader: html.Div
+    figures: dict
+    locks: dict
+    memory_report: pd.DataFrame
+    grid: Optional[DailyGrid]
+
+
+def tabFigures(current, tab):
+    """Returns the header and the figures of a tab, building them if this is the first call"""
+    with current.locks[tab]:
+        if tab not in current.figures:
+            (head, builders) = current.figure_tabs[tab]
+            plots = []
+            for build in builders:
+                # A builder returns one figure or a list of figures
+                figure = build()
+                plots.extend(figure if isinstance(figure, list) else [figure])
+            current.figures[tab] = (head, plots)
+            delta(f"Figures {tab}")
+    return current.figures[tab]
+
+
+def buildSnapshot(warm_start=False, previous_grid=None):
+    """Fetches and processes all data and registers the figure builders of every tab"""
+    global start
+    start = datetime.now()
+    # The startup snapshot has no previous data to keep, so going over the budget is only logged
+    memory_report = MemoryReport(TEMPO_MEMORY_BUDGET, strict=not warm_start)
+    tempo, supplementary, allocations_df, crew_df = loadData(warm_start, memory_report, previous_grid)
+
+    # ---------------------------------------------------------
+    # Data for the figures, computed on first use
+
+    @functools.cache
+    def byUser():
+        # Shared by the working hours table and the last reported day
+        return tempo.byUser(supplementary.working_hours, supplementary.calendar)
+
+    @functools.cache
+    def lastReported():
+        last_reported = pd.to_datetime(min(byUser()["Last"]))
+        logging.info("Last common day: %s", last_reported)
+        return last_reported
+
+    @functools.cache
+    def userNormalised():
+        df_user_time_rolling = tempo.userRolling7(["Billable", "Internal"])
+        delta("User Time Rolling")
+        df_user_normalised = normaliseUserRolling7(
+            df_user_time_rolling, supplementary.working_hours, supplementary.calendar
+        )
+        delta("User Normalised")
+        return df_user_normalised
+
+    @functools.cache
+    def teamNormalised():
+        df_team_normalised = normaliseTeamAverage(userNormalised())
+        delta("Team Normalised")
+        return df_team_normalised
+
+    @functools.cache
+    def userIncomeRolling():
+        df_user_income_rolling = tempo.userRolling7("Income")
+        delta("User Income Rolling")
+        return df_user_income_rolling
+
+    @functools.cache
+    def averageIncomeRolling():
+        # Average user data
+        df_average_income_rolling_7 = teamRollingAverage7(userIncomeRolling(), "Income")
+        df_average_income_rolling_30 = rollingAverage(df_average_income_rolling_7, "Income", 30)
+        df_average_income_rolling_30.columns = ["Date", "Income30"]
+        df_average_income_rolling_30 = df_average_income_rolling_30.merge(df_average_income_rolling_7, on=["Date"])
+        delta("Average Income Rolling")
+        return df_average_income_rolling_30
+
+    @functools.cache
+    def teamRollingTotal():
+        # Team total data
+        df_team_income_rolling = tempo.teamRolling7("Income")
+        df_team_income_rolling_30 = rollingAverage(df_team_income_rolling, "Income", 30)
+        df_team_income_rolling_30.columns = ["Date", "Income30"]
+        df_team_income_rolling_30 = df_team_income_rolling_30.merge(df_team_income_rolling, on=["Date"])
+        delta("Team Income Rolling")
+        return df_team_income_rolling_30
+
+    @functools.cache
+    def teamEarnRollingTotal():
+        # data for rolling earnings
+        df_team_earn_rolling = tempo.teamRolling7Relative(supplementary.costs)
+        df_team_earn_rolling_30 = rollingAverage(df_team_earn_rolling, "Diff", 30)
+        df_team_earn_rolling_30.columns = ["Date", "Diff30"]
+        df_team_earn_rolling_30 = df_team_earn_rolling_30.merge(df_team_earn_rolling, on=["Date"])
+        df_team_earn_rolling_365 = rollingAverage(df_team_earn_rolling, "Diff", 365)
+        df_team_earn_rolling_365.columns = ["Date", "Diff365"]
+        df_team_earn_rolling_365 = df_team_earn_rolling_365.merge(df_team_earn_rolling_30, on=["Date"])
+        df_team_earn_rolling_total = df_team_earn_rolling_365
+        df_team_earn_rolling_total.rename(
+            columns={
+                "Diff": "Rolling Weekly Average",
+                "Diff30": "Rolling Monthly Average",
+                "Diff365": "Rolling Yearly Average",
+            },
+            inplace=True,
+        )
+        delta("Team Earning Rolling")
+        return df_team_earn_rolling_total
+
+    @functools.cache
+    def comparison():
+        # Comparing normalized worktime with normalized income
+        df_comparison = teamEarnRollingTotal().merge(teamNormalised(), how="inner", on="Date")
+        delta("Comparison")
+        return df_comparison
+
+    @functools.cache
+    def allocations():
+        [figure_allocations] = figureAllocations(allocations_df)
+        delta("Allocations building")
+        return figure_allocations
+
+    def yearly(figure, data, years):
+        """One builder per year, newest first"""
+        return [functools.partial(figure, data, year) for year in reversed(years)]
+
+    # ---------------------------------------------------------
+    # Base rendering (only requires TEMPO_KEY)
+
+    main_list = [
+        lambda: figureEggBaskets(tempo, supplementary, crew_df),
+        lambda: tempo.tableByUser(supplementary.working_hours, tableHeight, COLOR_HEAD, COLOR_ONE, byUser()),
+    ]
+    if not supplementary.rates.empty:
+        main_list.append(lambda: tempo.missingRatesTable(tableHeight, COLOR_HEAD, COLOR_ONE))
+
+    # Allocations
+    # Requires Notion Allocations DB
+    if not allocations_df.empty:
+        main_list.append(allocations)
+
+    tab_children = [dcc.Tab(label="Main", value="start_page")]
+    figure_tabs = {"start_page": ("Main", main_list)}
+
+    if SHOWTAB_PROJECTS:
+        tab_children.append(dcc.Tab(label="Time spent on...", value="projects"))
+        figure_tabs["projects"] = ("What we work on", [lambda: figureProjects(tempo)])
+    if SHOWTAB_BILLABLE:
+        tab_children.append(dcc.Tab(label="Billable", value="billable"))
+        figure_tabs["billable"] = ("Billable work", [lambda: figureBillable(tempo)])
+    if SHOWTAB_INTERNAL:
+        tab_children.append(dcc.Tab(label="Internal", value="internal"))
+        figure_tabs["internal"] = ("Internal work", [lambda: figureInternal(tempo)])
+    if SHOWTAB_POPULAR_PROJECTS:
+        tab_children.append(dcc.Tab(label="Popular projects", value="popular_projects"))
+        figure_tabs["popular_projects"] = ("Popular projects", [lambda: figurePopularProjects(tempo)])
+    if SHOWTAB_PAYING_PROJECTS:
+        if "Real_income" in supplementary.costs:
+            max_year = int(supplementary.raw_costs[supplementary.raw_costs["Real_income"] != 0]["Year"].max())
+            figures = yearly(figurePayingProjects, tempo, range(START_DATE.year, max_year + 1))
+            figure_tabs["paying_projects"] = ("Paying projects", figures)
+            tab_children.append(dcc.Tab(label="Paying projects", value="paying_projects"))
+
+    # ---------------------------------------------------------
+    # Dynamic addition of content
+
+    # ---------------------------------------------------------
+    # Allocations
+    # Requires Notion Allocations DB
+    if not allocations_df.empty:
+        # Update projects page
+        (head, plots) = figure_tabs["projects"]
+        plots.append(allocations)
+        figure_tabs["projects"] = (head, plots)
+
+    # ---------------------------------------------------------
+    # Time spent groupings
+    # Requires rates file
+    if not supplementary.rates.empty:
+        # Update projects page
+        (head, plots) = figure_tabs["projects"]
+        plots.append(lambda: figureSpentTimePercentage(tempo))
+        figure_tabs["projects"] = (head, plots)
+
+    # ---------------------------------------------------------
+    # Financial data
+    # Requires income and costs in config files
     if "Real_income" in supplementary.costs:
         max_year = int(supplementary.raw_costs[supplementary.raw_costs["Real_income"] != 0]["Year"].max())
-        figures = [figurePayingProjects(tempo, year) for year in range(START_DATE.year, max_year + 1)]
-        figure_tabs["paying_projects"] = ("Paying projects", figures[::-1])
-        tab_children.append(dcc.Tab(label="Paying projects", value="paying_projects"))
 
+        figures = yearly(figureFinancialTotal, supplementary, range(START_DATE.year, max_year + 1))
+
+        # Add tabs
+        if SHOWTAB_FINANCE:
+            figure_tabs["finance"] = ("Finances (real numbers)", figures)
+            tab_children.append(dcc.Tab(label="Finances", value="finance"))
+
+    # ---------------------------------------------------------
+    # Project rates
+    # Requires config: rates, workinghours and costs
+    if not (supplementary.rates.empty or supplementary.working_hours.empty):
+        # Add tabs
+        if SHOWTAB_RATES:
+            figure_tabs["rates"] = ("Rates", [lambda: tempo.ratesTable(tableHeight, COLOR_HEAD, COLOR_ONE)])
+            tab_children.append(dcc.Tab(label="Rates", value="rates"))
+        if SHOWTAB_ROLLING_INCOME:
+            figure_tabs["rolling_income"] = (
+                "Rolling income",
+                [
+                    lambda: figureRollingTotal(teamRollingTotal(), supplementary),
+                    lambda: figureRollingIncomeTeam(averageIncomeRolling(), lastReported()),
+                    lambda: figureRollingIncomeIndividual(userIncomeRolling()),
+                ],
+            )
+            tab_children.append(dcc.Tab(label="Income analysis", value="rolling_income"))
+        if not supplementary.costs.empty:
+            # Update main page
+            (head, plots) = figure_tabs["start_page"]
+            plots.insert(0, lambda: figureRollingEarnings(teamEarnRollingTotal(), supplementary, lastReported()))
+            plots.insert(0, lambda: figureFinancialTotal(supplementary))
+            figure_tabs["start_page"] = (head, plots)
+
+    # ---------------------------------------------------------
+    # Normalised working time
+    # Requires config files: workinghours
+    if not supplementary.working_hours.empty:
+        # Add tab
+        if SHOWTAB_NORMALISED_WORKTIME:
+            figure_tabs["normalised_worktime"] = (
+                "Normalised Work Time",
+                [
+                    lambda: figureNormalisedTeam(teamNormalised(), lastReported()),
+                    lambda: figureNormalisedIndividual(userNormalised()),
+                ],
+            )
+            tab_children.append(dcc.Tab(label="Normalised Work Time", value="normalised_worktime"))
+
+    # ---------------------------------------------------------
+    # Break even
+    # Requires config files: workinghours, rates, finances
+    if not supplementary.working_hours.empty and not supplementary.rates.empty and not supplementary.costs.empty:
+        # Add tab
+        if SHOWTAB_COMPARISON:
+            figures = []
+            figures.append(lambda: figureMinumumRates(crew_df))
+            figures.append(figureRatesToEUR)
+            figures.append(lambda: sustainableHours(crew_df))
+            figures.append(lambda: figureEarningsVersusWorkload(comparison()))
+
+            figure_tabs["comparison"] = (
+                "Comparing workload with income",
+                figures,
+            )
+            tab_children.append(dcc.Tab(label="Break even", value="comparison"))
+
+    tab_structure = dcc.Tabs(id="tabs-graph", value="start_page", children=tab_children)
+    pageheader = html.Div(
+        [
+            dcc.Markdown("## Verifa Metrics Dashboard"),
+            dcc.Markdown(f"""#### {START_DATE.strftime("%b %d, %Y")} ➜ {yesterday().strftime("%b %d, %Y")}"""),
+        ]
+    )
+    locks = {tab: threading.Lock() for tab in figure_tabs}
+    new_snapshot = Snapshot(
+        pd.Timestamp.now(), figure_tabs, tab_structure, pageheader, {}, locks, memory_report.frame(), tempo.grid
+    )
+
+    # Most sessions only look at the main tab, so it is ready before the snapshot is used
+    tabFigures(new_snapshot, "start_page")
+    delta("Snapshot built")
+
+    return new_snapshot
 
-delta("Base Rendering")
 
 # =========================================================
-# Dynamic addition of content
+# Refresh
 # =========================================================
 
-# ---------------------------------------------------------
-# Allocations
-# Requires Notion Allocations DB
-if not allocations_df.empty:
-    # Update projects page
-    (head, plots) = figure_tabs["projects"]
-    plots.append(figure_allocations)
-    figure_tabs["projects"] = (head, plots)
-
-# ---------------------------------------------------------
-# Time spent groupings
-# Requires rates file
-if not supplementary.rates.empty:
-    figure_time_spent = figureSpentTimePercentage(tempo)
-    # Update projects page
-    (head, plots) = figure_tabs["projects"]
-    plots.append(figure_time_spent)
-    figure_tabs["projects"] = (head, plots)
-
-# ---------------------------------------------------------
-# Financial data
-# Requires income and costs in config files
-if "Real_income" in supplementary.costs:
-    max_year = int(supplementary.raw_costs[supplementary.raw_costs["Real_income"] != 0]["Year"].max())
-
-    figures = [figureFinancialTotal(supplementary, year) for year in range(START_DATE.year, max_year + 1)]
-
-    # Add tabs
-    if SHOWTAB_FINANCE:
-        figure_tabs["finance"] = ("Finances (real numbers)", figures[::-1])
-        tab_children.append(dcc.Tab(label="Finances", value="finance"))
-
-# ---------------------------------------------------------
-# Project rates
-# Requires config: rates, workinghours and costs
-if not (supplementary.rates.empty or supplementary.working_hours.empty):
-    # Add tabs
-    if SHOWTAB_RATES:
-        figure_tabs["rates"] = ("Rates", [table_rates])
-        tab_children.append(dcc.Tab(label="Rates", value="rates"))
-    if SHOWTAB_ROLLING_INCOME:
-        figure_tabs["rolling_income"] = (
-            "Rolling income",
-            [
-                figureRollingTotal(df_team_rolling_total, supplementary),
-                figureRollingIncomeTeam(df_average_income_rolling_30, last_reported),
-                figureRollingIncomeIndividual(df_user_income_rolling),
-            ],
-        )
-        tab_children.append(dcc.Tab(label="Income analysis", value="rolling_income"))
-    if not supplementary.costs.empty:
-        figure_rolling_earnings = figureRollingEarnings(df_team_earn_rolling_total, supplementary, last_reported)
-        # Update main page
-        (head, plots) = figure_tabs["start_page"]
-        plots.insert(0, figure_rolling_earnings)
-        plots.insert(0, figureFinancialTotal(supplementary))
-        figure_tabs["start_page"] = (head, plots)
-
-
-# ---------------------------------------------------------
-# Normalised working time
-# Requires config files: workinghours
-if not supplementary.working_hours.empty:
-    # Add tab
-    if SHOWTAB_NORMALISED_WORKTIME:
-        figure_tabs["normalised_worktime"] = (
-            "Normalised Work Time",
-            [figureNormalisedTeam(df_team_normalised, last_reported), figureNormalisedIndividual(df_user_normalised)],
-        )
-        tab_children.append(dcc.Tab(label="Normalised Work Time", value="normalised_worktime"))
-
-
-# ---------------------------------------------------------
-# Break even
-# Requires config files: workinghours, rates, finances
-if (
-    not supplementary.working_hours.empty
-    and not supplementary.rates.empty
-    and not supplementary.costs.empty
-    and not df_comparison.empty
-):
-    # Add tab
-    if SHOWTAB_COMPARISON:
-        figures = []
-        figures.append(figureMinumumRates(crew_df))
-        figures.append(figureRatesToEUR())
-        figures.append(sustainableHours(crew_df))
-        figures.append(figureEarningsVersusWorkload(df_comparison))
-
-        figure_tabs["comparison"] = (
-            "Comparing workload with income",
-            figures,
-        )
-        tab_children.append(dcc.Tab(label="Break even", value="comparison"))
+snapshot = buildSnapshot(warm_start=True)
+refresh_lock = threading.Lock()
+refresh_thread = None
+
+
+def refresh():
+    """Builds a new snapshot and swaps it in, the current snapshot is kept if anything fails"""
+    global snapshot
+    with refresh_lock:
+        try:
+            new_snapshot = buildSnapshot(previous_grid=snapshot.grid)
+        except Exception:  # pylint: disable=broad-except
+            logging.exception("Refresh failed, keeping the snapshot from %s", snapshot.created)
+            return
+        # Rebinding the name is atomic, requests in flight keep the snapshot they already read
+        snapshot = new_snapshot
+    logging.info("Refreshed the snapshot at %s", new_snapshot.created)
+
+
+def startRefresh(interval=TEMPO_REFRESH_INTERVAL) -> Optional[threading.Thread]:
+    """Starts a daemon thread refreshing the snapshot every interval hours, once per process"""
+    global refresh_thread
+    if interval <= 0 or api_snapshot.active:
+        return None
+    if refresh_thread is None:
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval * 3600):
+                refresh()
+
+        refresh_thread = threading.Thread(target=run, name="refresh", daemon=True)
+        refresh_thread.start()
+    return refresh_thread
 
 
 # =========================================================
@@ -1013,19 +1063,19 @@ if (
 # =========================================================
 
 
-tab_structure = dcc.Tabs(id="tabs-graph", value="start_page", children=tab_children)
-
-pageheader = html.Div(
-    [
-        dcc.Markdown("## Verifa Metrics Dashboard"),
-        dcc.Markdown(f"""#### {START_DATE.strftime("%b %d, %Y")} ➜ {YESTERDAY.strftime("%b %d, %Y")}"""),
-    ]
-)
+def layout():
+    """The page layout of the current snapshot, evaluated on every page load"""
+    current = snapshot
+    return html.Div(
+        className="px-8", children=[current.pageheader, current.tab_structure, html.Div(id="tabs-content-graph")]
+    )
 
 
 def render_content(tab):
+    # A refresh may swap the snapshot at any time, so it is read once
+    current = snapshot
     delta(tab)
-    (head, plots) = figure_tabs[tab]
+    (head, plots) = tabFigures(current, tab if tab in current.figure_tabs else "start_page")
     sections = [dcc.Graph(id="plot", figure=figure) for figure in plots]
     sections.insert(0, dcc.Markdown("### " + head))
     return html.Div(html.Section(children=sections))
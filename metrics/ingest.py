@@ -0,0 +1,88 @@
+"""Concurrent ingestion of the Notion, Tempo and Jira data"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from metrics.api_snapshot import api_snapshot
+from metrics.constants import (
+    NOTION_ALLOCATION_DATABASE_ID,
+    NOTION_CREW_DATABASE_ID,
+    NOTION_CURRENCY_RATES_DATABASE_ID,
+    NOTION_DEFAULT_RATES_DATABASE_ID,
+    NOTION_EXCEPTIONS_RATES_DATABASE_ID,
+    NOTION_FINANCIAL_DATABASE_ID,
+    NOTION_HOLIDAYS_DATABASE_ID,
+    NOTION_INTERNAL_RATES_DATABASE_ID,
+    NOTION_KEY,
+    NOTION_WORKINGHOURS_DATABASE_ID,
+    TEMPO_INGEST_WORKERS,
+)
+from metrics.notion import (
+    Allocations,
+    Crew,
+    Financials,
+    Holidays,
+    RatesCurrency,
+    RatesDefault,
+    RatesExceptions,
+    RatesInternal,
+    WorkingHours,
+)
+from metrics.tempo_data import TempoData
+
+# name: (class, database id, method that populates class.data)
+NOTION_SOURCES = {
+    "financials": (Financials, NOTION_FINANCIAL_DATABASE_ID, "get_financials"),
+    "working_hours": (WorkingHours, NOTION_WORKINGHOURS_DATABASE_ID, "get_workinghours"),
+    "holidays": (Holidays, NOTION_HOLIDAYS_DATABASE_ID, "get_holidays"),
+    "allocations": (Allocations, NOTION_ALLOCATION_DATABASE_ID, "get_allocations"),
+    "crew": (Crew, NOTION_CREW_DATABASE_ID, "get_crew"),
+    "default_rates": (RatesDefault, NOTION_DEFAULT_RATES_DATABASE_ID, "get_rates"),
+    "exceptional_rates": (RatesExceptions, NOTION_EXCEPTIONS_RATES_DATABASE_ID, "get_rates"),
+    "internal_keys": (RatesInternal, NOTION_INTERNAL_RATES_DATABASE_ID, "get_rates"),
+    "currency_rates": (RatesCurrency, NOTION_CURRENCY_RATES_DATABASE_ID, "get_rates"),
+}
+
+
+def fetchNotion(name: str) -> pd.DataFrame:
+    """Returns the data of a Notion database, or an empty DataFrame if it is not configured"""
+    notion_class, database_id, method = NOTION_SOURCES[name]
+    if api_snapshot.replaying:
+        configured = api_snapshot.recorded(f"notion.{notion_class.__name__}")
+    else:
+        configured = bool(NOTION_KEY and database_id)
+    if not configured:
+        return pd.DataFrame()
+    start = datetime.now()
+    source = notion_class(NOTION_KEY, database_id)
+    getattr(source, method)()
+    logging.info("%s: Notion %s", datetime.now() - start, name)
+    return source.data
+
+
+def loadTempo(tempo: TempoData, from_date, to_date) -> TempoData:
+    start = datetime.now()
+    tempo.load(from_date=from_date, to_date=to_date)
+    logging.info("%s: TempoData", datetime.now() - start)
+    return tempo
+
+
+def ingest(tempo: TempoData, from_date, to_date, max_workers: int = TEMPO_INGEST_WORKERS) -> dict[str, pd.DataFrame]:
+    """
+    Loads the Tempo data and fetches all Notion databases concurrently.
+    The time of internal keys is not billable as soon as both are loaded.
+    Returns the Notion data by source name, see NOTION_SOURCES.
+    The responses are written to the API snapshot when recording.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Tempo is the slowest source, so it is started first
+        tempo_future = pool.submit(loadTempo, tempo, from_date, to_date)
+        notion_futures = {name: pool.submit(fetchNotion, name) for name in NOTION_SOURCES}
+        frames = {name: future.result() for name, future in notion_futures.items()}
+        tempo_future.result()
+    tempo.zeroOutBillableTime(frames["internal_keys"])
+    api_snapshot.write()
+    return frames
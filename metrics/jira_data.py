@@ -0,0 +1,209 @@
+"""Cached lookups against Jira"""
+
+import json
+import logging
+import os
+from typing import Iterable, Optional, cast
+
+import pandas as pd
+from jira import JIRA, Issue, JIRAError
+
+ISSUE_CACHE_VERSION = 1
+USER_CACHE_VERSION = 1
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+class IssueResolver:
+    """
+    Maps Jira issue ids to issue keys, optionally persisted to disk.
+
+    Only ids that are not in the cache are fetched, in batched `id in (...)` queries that only
+    ask for the key. Issues updated since the last lookup are re-read so that issues moved to
+    another project get their new key.
+    """
+
+    path: Optional[str]
+    keys: dict[int, str]
+    checked: Optional[str]
+    changed: set[int]
+
+    def __init__(self, path: Optional[str] = None, batch_size: int = 100) -> None:
+        self.path = os.path.join(path, "issues.json") if path else None
+        self.batch_size = batch_size
+        self.keys = {}
+        self.checked = None
+        self.changed = set()
+        self.read()
+
+    def read(self) -> None:
+        """Read the cache from disk, an unreadable or outdated file is ignored"""
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                stored = json.load(fh)
+        except (OSError, ValueError) as err:
+            logging.warning("Ignoring issue cache %s: %s", self.path, err)
+            return
+        if stored.get("version") != ISSUE_CACHE_VERSION:
+            return
+        self.keys = {int(issue_id): key for issue_id, key in stored["keys"].items()}
+        self.checked = stored["checked"]
+        logging.info("Read %s issue keys from %s", len(self.keys), self.path)
+
+    def write(self) -> None:
+        """Write the cache to disk, replacing the old file atomically"""
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump({"version": ISSUE_CACHE_VERSION, "checked": self.checked, "keys": self.keys}, fh)
+        os.replace(tmp_path, self.path)
+
+    def search(self, jira_client: JIRA, jql: str) -> dict[int, str]:
+        """Returns id -> key for all issues matching the query"""
+        found = {}
+        start_at = 0
+        while True:
+            issues = jira_client.search_issues(
+                jql_str=jql, startAt=start_at, maxResults=self.batch_size, fields="key", validate_query=False
+            )
+            if len(issues) == 0:
+                break
+            found.update({int(issue.id): issue.key for issue in cast(list[Issue], issues)})
+            start_at += len(issues)
+        return found
+
+    def updateMoved(self, jira_client: JIRA) -> None:
+        """Re-reads the keys of cached issues that were updated since the last lookup"""
+        if self.checked is None or not self.keys:
+            return
+        updated = self.search(jira_client, f'updated >= "{self.checked}"')
+        moved = {issue_id: key for issue_id, key in updated.items() if self.keys.get(issue_id, key) != key}
+        for issue_id, key in moved.items():
+            logging.info("Issue %s moved from %s to %s", issue_id, self.keys[issue_id], key)
+        self.keys.update(moved)
+        self.changed.update(moved)
+
+    def resolve(self, jira_client: JIRA, issue_ids: Iterable) -> pd.DataFrame:
+        """
+        Returns the IssueId and Key columns for the given issue ids as DataFrame,
+        self.changed holds the ids whose key moved or was fetched
+        """
+        ids = sorted({int(issue_id) for issue_id in issue_ids})
+        self.changed = set()
+        # the day before, since JQL dates are in the timezone of the Jira user
+        checked = str((pd.Timestamp.utcnow() - pd.Timedelta(days=1)).date())
+        self.updateMoved(jira_client)
+
+        unknown = [issue_id for issue_id in ids if issue_id not in self.keys]
+        for batch in _chunks(unknown, self.batch_size):
+            found = self.search(jira_client, f"id in ({','.join(map(str, batch))})")
+            self.keys.update(found)
+            self.changed.update(found)
+        missing = [issue_id for issue_id in unknown if issue_id not in self.keys]
+        if missing:
+            logging.warning("Could not find Jira issues for ids: %s", missing)
+        logging.info("Resolved %s issue keys, %s fetched from Jira", len(ids), len(unknown))
+
+        self.checked = checked
+        self.write()
+        return pd.DataFrame(
+            [[issue_id, self.keys[issue_id]] for issue_id in ids if issue_id in self.keys], columns=["IssueId", "Key"]
+        )
+
+
+class UserDirectory:
+    """
+    Maps Jira accountIds to display names, optionally persisted to disk.
+
+    The whole directory is paged through when it is older than max_age hours. In between, only
+    accountIds that are not in the cache, e.g. from new worklogs, are looked up one by one.
+    """
+
+    path: Optional[str]
+    names: dict[str, str]
+    fetched: Optional[str]
+
+    def __init__(self, path: Optional[str] = None, max_age: float = 24, page_size: int = 200) -> None:
+        self.path = os.path.join(path, "users.json") if path else None
+        self.max_age = pd.Timedelta(hours=max_age)
+        self.page_size = page_size
+        self.names = {}
+        self.fetched = None
+        self.read()
+
+    def read(self) -> None:
+        """Read the cache from disk, an unreadable or outdated file is ignored"""
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                stored = json.load(fh)
+        except (OSError, ValueError) as err:
+            logging.warning("Ignoring user cache %s: %s", self.path, err)
+            return
+        if stored.get("version") != USER_CACHE_VERSION:
+            return
+        self.names = stored["names"]
+        self.fetched = stored["fetched"]
+        logging.info("Read %s users from %s", len(self.names), self.path)
+
+    def write(self) -> None:
+        """Write the cache to disk, replacing the old file atomically"""
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump({"version": USER_CACHE_VERSION, "fetched": self.fetched, "names": self.names}, fh)
+        os.replace(tmp_path, self.path)
+
+    def expired(self) -> bool:
+        return self.fetched is None or pd.Timestamp.utcnow() - pd.Timestamp(self.fetched) > self.max_age
+
+    def fetchAll(self, jira_client: JIRA) -> dict[str, str]:
+        """Returns accountId -> displayName for all users, page by page"""
+        found = {}
+        start_at = 0
+        while True:
+            users = jira_client.search_users(startAt=start_at, maxResults=self.page_size, query="*")
+            if len(users) == 0:
+                break
+            found.update({user.accountId: user.displayName for user in users})
+            start_at += len(users)
+        return found
+
+    def refresh(self, jira_client: JIRA) -> None:
+        """Pages through the whole directory if the cache has expired"""
+        if not self.expired():
+            return
+        fetched = str(pd.Timestamp.utcnow())
+        self.names.update(self.fetchAll(jira_client))
+        self.fetched = fetched
+        logging.info("Fetched %s users from Jira", len(self.names))
+        self.write()
+
+    def resolve(self, jira_client: JIRA, account_ids: Iterable) -> pd.DataFrame:
+        """Returns the User and UserId columns for the given accountIds as DataFrame"""
+        ids = sorted(set(account_ids))
+        self.refresh(jira_client)
+
+        unknown = [account_id for account_id in ids if account_id not in self.names]
+        for account_id in unknown:
+            try:
+                self.names[account_id] = jira_client.user(account_id).displayName
+            except JIRAError as err:
+                logging.warning("Could not find Jira user %s: %s", account_id, err.text)
+        if unknown:
+            logging.info("Looked up %s users missing from the directory", len(unknown))
+            self.write()
+        return pd.DataFrame(
+            [[self.names[account_id], account_id] for account_id in ids if account_id in self.names],
+            columns=["User", "UserId"],
+        )
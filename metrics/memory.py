@@ -0,0 +1,72 @@
+"""Memory usage of the processed frames"""
+
+import logging
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+MB = 1024 * 1024
+
+
+def memoryUsage(frame: Union[pd.DataFrame, np.ndarray]) -> int:
+    """Bytes used by a DataFrame, including the contents of object columns, or by an array"""
+    if isinstance(frame, pd.DataFrame):
+        return int(frame.memory_usage(deep=True).sum())
+    return int(frame.nbytes)
+
+
+def downcast(frame: pd.DataFrame, columns: list[str], tolerance: float = 0) -> pd.DataFrame:
+    """
+    Returns frame with the integer columns as small as possible, and the float columns as float32
+    if no value changes by more than tolerance
+    """
+    frame = frame.copy()
+    for column in frame[columns].select_dtypes(include="integer").columns:
+        frame[column] = pd.to_numeric(frame[column], downcast="integer")
+    for column in frame[columns].select_dtypes(include="float64").columns:
+        values = frame[column].to_numpy()
+        narrow = values.astype(np.float32)
+        if np.nanmax(np.abs(narrow - values), initial=0) <= tolerance:
+            frame[column] = narrow
+    return frame
+
+
+class MemoryReport:
+    """
+    The memory usage of the frames at each stage of the processing.
+    With a budget (MB), check() raises MemoryError when the last stage uses more, or only logs it unless strict.
+    """
+
+    budget: float
+    strict: bool
+    rows: list[dict]
+
+    def __init__(self, budget: float = 0, strict: bool = True) -> None:
+        self.budget = budget
+        self.strict = strict
+        self.rows = []
+
+    def record(self, stage: str, frames: dict[str, Union[pd.DataFrame, np.ndarray]]) -> None:
+        for name, frame in frames.items():
+            self.rows.append({"Stage": stage, "Frame": name, "Rows": len(frame), "MB": memoryUsage(frame) / MB})
+        logging.info("Memory %s: %.1f MB", stage, self.total(stage))
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.rows, columns=["Stage", "Frame", "Rows", "MB"])
+
+    def total(self, stage: str) -> float:
+        return sum(row["MB"] for row in self.rows if row["Stage"] == stage)
+
+    def check(self) -> None:
+        if not self.budget or not self.rows:
+            return
+        stage = self.rows[-1]["Stage"]
+        if self.total(stage) > self.budget:
+            message = (
+                f"{stage} uses {self.total(stage):.1f} MB, more than the budget of {self.budget} MB\n"
+                + self.frame()[lambda report: report["Stage"] == stage].to_string(index=False)
+            )
+            if self.strict:
+                raise MemoryError(message)
+            logging.error(message)
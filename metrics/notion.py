@@ -3,15 +3,76 @@
 import logging
 import os
 import sys
-from typing import Optional
+import time
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
 
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import requests
+from requests.adapters import HTTPAdapter
 
+from metrics.api_snapshot import api_snapshot
+from metrics.business_calendar import WEEKMASK
+from metrics.constants import TEMPO_INGEST_WORKERS
 from metrics.tempo_config import EUR2SEK
 
+NOTION_API_URL = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+# Notion answers 429 when rate limited and 5xx when it is having a bad day
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 5
+MAX_BACKOFF = 30
+
+# One keep-alive session shared by all databases, with room for the concurrent ingestion
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_maxsize=TEMPO_INGEST_WORKERS))
+
+
+def retryDelay(response: requests.Response, attempt: int) -> float:
+    """Seconds to wait before the next attempt, Retry-After wins over exponential backoff"""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is not None:
+        try:
+            return max(float(retry_after), 0)
+        except ValueError:
+            pass
+    return min(2**attempt, MAX_BACKOFF)
+
+
+class Column(NamedTuple):
+    """A DataFrame column and where to find its value in the properties of a Notion row"""
+
+    name: str
+    path: tuple
+    dtype: Optional[str] = None
+    default: Any = None
+
+
+def lookup(properties: dict, path: tuple, default: Any = None) -> Any:
+    """Follows the path of keys and indexes, returns default for missing or empty properties"""
+    value: Any = properties
+    try:
+        for step in path:
+            value = value[step]
+    except (KeyError, IndexError, TypeError):
+        return default
+    return default if value is None else value
+
+
+def extract(results: Iterable[dict], schema: list[Column]) -> pd.DataFrame:
+    """Builds a DataFrame from Notion rows, column by column according to the schema"""
+    columns: dict[str, list] = {column.name: [] for column in schema}
+    for item in results:
+        properties = item["properties"]
+        for column in schema:
+            columns[column.name].append(lookup(properties, column.path, column.default))
+    rows = len(columns[schema[0].name])
+    # Rows are labelled last to first, as when they were prepended one at a time
+    data = pd.DataFrame(columns, index=range(rows - 1, -1, -1))
+    return data.astype({column.name: column.dtype for column in schema if column.dtype})
+
 
 class Notion:
     """
@@ -20,128 +81,143 @@ class Notion:
 
     token: str
     database_id: str
+    data: pd.DataFrame
+    schema: list[Column] = []
 
     def __init__(self, token: Optional[str] = None, database_id: str = "") -> None:
         token = token or os.environ.get("NOTION_KEY")
-        if token is None:
+        if token is None and not api_snapshot.replaying:
             sys.exit("Notion token not provided or NOTION_KEY not set")
-        self.token = token
+        self.token = token or ""
         self.database_id = database_id
 
-    def fetch_data(self, payload: dict[str, str] = {}) -> map:
-        url = f"https://api.notion.com/v1/databases/{self.database_id}/query"
+    def query(self, payload: dict) -> dict:
+        """Returns one page of the database, recorded or replayed when there is an API snapshot"""
+        return api_snapshot.call(f"notion.{type(self).__name__}", self.fetchPage, payload)
+
+    def fetchPage(self, payload: dict) -> dict:
+        """Fetches one page of the database, retrying when rate limited or on server errors"""
+        url = f"{NOTION_API_URL}/databases/{self.database_id}/query"
         headers = {
             "Authorization": f"Bearer {self.token}",
-            "Notion-Version": "2022-06-28",
+            "Notion-Version": NOTION_VERSION,
             "Content-Type": "application/json",
         }
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        json_data = response.json()
-        # Recursive until all rows are fetched, only 100 rows max allowed
-        if json_data["has_more"]:
-            next_cur = json_data["next_cursor"]
-            json_data["results"] += self.fetch_data({"start_cursor": next_cur})
+        attempt = 0
+        while True:
+            response = session.post(url, headers=headers, json=payload, timeout=30)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == MAX_RETRIES:
+                break
+            delay = retryDelay(response, attempt)
+            logging.warning("Notion answered %s, retrying in %ss", response.status_code, delay)
+            time.sleep(delay)
+            attempt += 1
+        response.raise_for_status()
+        return response.json()
+
+    def results(self, payload: Optional[dict] = None) -> Iterator[dict]:
+        """Yields the rows of the database, one page (max 100 rows) is fetched at a time"""
+        payload = dict(payload or {})
+        while True:
+            json_data = self.query(payload)
+            yield from json_data["results"]
+            if not json_data["has_more"]:
+                break
+            payload["start_cursor"] = json_data["next_cursor"]
 
-        return json_data["results"]
+    def fetch_data(self, payload: Optional[dict] = None) -> list:
+        return list(self.results(payload))
+
+    def parse(self) -> pd.DataFrame:
+        """Fetches the database as a DataFrame according to the schema of the class"""
+        return extract(self.results(), self.schema)
 
 
 class WorkingHours(Notion):
     "The class for working hour handling"
     data: pd.DataFrame
+    schema = [
+        Column("User", ("User", "title", 0, "plain_text")),
+        Column("Daily", ("Daily", "number"), "float"),
+        Column("Delta", ("Delta", "number"), "float"),
+        Column("Start", ("Start", "rich_text", 0, "plain_text"), default="*"),
+        Column("Stop", ("Stop", "rich_text", 0, "plain_text"), default="*"),
+        Column("Country", ("Country", "select", "name"), default=""),
+        Column("Weekmask", ("Weekmask", "rich_text", 0, "plain_text"), default=WEEKMASK),
+    ]
 
     def get_workinghours(self) -> None:
-        result_dict = self.fetch_data()
-        data = pd.DataFrame(columns=["User", "Daily", "Delta", "Start", "Stop"])
+        self.data = self.parse().sort_values(by=["User"])
 
-        for item in result_dict:
-            user = item["properties"]["User"]["title"][0]["plain_text"]
-            daily = item["properties"]["Daily"]["number"]
-            delta = item["properties"]["Delta"]["number"]
-            start = item["properties"]["Start"]["rich_text"][0]["plain_text"]
-            stop = item["properties"]["Stop"]["rich_text"][0]["plain_text"]
 
-            data.loc[-1] = [user, daily, delta, start, stop]
-            data.index = data.index + 1
+class Holidays(Notion):
+    "The class for public holidays, holidays without a country apply to every country"
+    data: pd.DataFrame
+    schema = [
+        Column("Date", ("Date", "date", "start")),
+        Column("Country", ("Country", "select", "name"), default=""),
+    ]
 
-        self.data = data.sort_values(by=["User"])
+    def get_holidays(self) -> None:
+        data = self.parse()
+        data["Date"] = pd.to_datetime(data["Date"])
+        self.data = data.sort_values(by=["Date"])
 
 
 class Allocations(Notion):
     "The class for allocations"
     data: pd.DataFrame
+    schema = [
+        Column("User", ("Assign", "people", 0, "name")),
+        Column("Allocation", ("Allocation", "number"), "float"),
+        Column("Start", ("Date", "date", "start")),
+        Column("Stop", ("Date", "date", "end")),
+        Column("Unconfirmed", ("Unconfirmed", "checkbox"), "bool", False),
+        Column("JiraID", ("Task ID", "rich_text", 0, "plain_text"), default="?"),
+    ]
 
     def get_allocations(self) -> None:
-        result_dict = self.fetch_data()
-        data = pd.DataFrame(columns=["User", "Allocation", "Start", "Stop", "Unconfirmed", "JiraID"])
-
-        for item in result_dict:
-            user = item["properties"]["Assign"]["people"][0]["name"]
-            allocation = item["properties"]["Allocation"]["number"]
-            start = item["properties"]["Date"]["date"]["start"]
-            stop = item["properties"]["Date"]["date"]["end"]
-            unconfirmed = item["properties"]["Unconfirmed"]["checkbox"]
-            jiratext = item["properties"]["Task ID"]["rich_text"]
-            if jiratext == []:
-                jiraid = "?"
-            else:
-                jiraid = jiratext[0]["plain_text"]
-
-            data.loc[-1] = [user, allocation, start, stop, unconfirmed, jiraid]
-            data.index = data.index + 1
-
-        self.data = data.sort_values(by=["User"])
+        self.data = self.parse().sort_values(by=["User"])
 
 
 class Crew(Notion):
     "The class for crew data"
     data: pd.DataFrame
+    schema = [
+        Column("User", ("Person", "people", 0, "name")),
+        Column("Role", ("Role", "select", "name")),
+        Column("Hours", ("Consulting Hours", "number"), "float"),
+        Column("Total cost", ("Total Cost", "number"), "float"),
+        Column("UserId", ("JIRA ID", "rich_text", 0, "plain_text")),
+        Column("Currency", ("Currency", "select", "name"), default="EUR"),
+    ]
 
     def get_crew(self) -> None:
-        result_dict = self.fetch_data()
-        data = pd.DataFrame(columns=["User", "Role", "Hours", "Total cost", "UserId"])
-        for item in result_dict:
-            user = item["properties"]["Person"]["people"][0]["name"]
-            jira_id = item["properties"]["JIRA ID"]["rich_text"][0]["plain_text"]
-            role = item["properties"]["Role"]["select"]["name"]
-            currency = item["properties"]["Currency"]["select"]["name"]
-            cost = item["properties"]["Total Cost"]["number"] / (EUR2SEK if currency == "SEK" else 1)
-            hours = item["properties"]["Consulting Hours"]["number"]
-            data.loc[-1] = [user, role, hours, cost, jira_id]
-            data.index = data.index + 1
-
-        self.data = data.sort_values(by=["User"])
+        data = self.parse()
+        data["Total cost"] = data["Total cost"] / np.where(data["Currency"] == "SEK", EUR2SEK, 1)
+        self.data = data.drop(columns=["Currency"]).sort_values(by=["User"])
 
 
 class Financials(Notion):
     "The class for finance data"
     data: pd.DataFrame
+    schema = [
+        Column("Month", ("Month", "title", 0, "plain_text")),
+        Column("External_cost", ("external-cost", "formula", "number"), "float"),
+        Column("Real_income", ("real-income", "formula", "number"), "float"),
+        Column("SEK Start", ("SEK Start", "number"), "float", 0),
+        Column("EUR Start", ("EUR Start", "number"), "float", 0),
+        Column("AB-Cost", ("AB-Cost", "number")),
+        Column("OY-Cost", ("OY-Cost", "number")),
+    ]
 
     def get_financials(self) -> None:
-        result_dict = self.fetch_data()
-
-        data = pd.DataFrame(columns=["Month", "External_cost", "Real_income", "Starting_amount"])
-
-        for item in result_dict:
-            month = item["properties"]["Month"]["title"][0]["plain_text"]
-            extcost = item["properties"]["external-cost"]["formula"]["number"]
-            income = item["properties"]["real-income"]["formula"]["number"]
-
-            sekstart = item["properties"]["SEK Start"]["number"]
-            eurstart = item["properties"]["EUR Start"]["number"]
-            start = 0
-            if sekstart is not None:
-                start += sekstart / EUR2SEK
-            if eurstart is not None:
-                start += eurstart
-
-            abcost = item["properties"]["AB-Cost"]["number"]
-            oycost = item["properties"]["OY-Cost"]["number"]
-
-            if oycost is not None and abcost is not None:
-                data.loc[-1] = [month, extcost, income, start]
-                data.index = data.index + 1
-
-        self.data = data.sort_values(by=["Month"])
+        data = self.parse()
+        # Only months where both companies have reported their costs
+        data = data[data["AB-Cost"].notna() & data["OY-Cost"].notna()]
+        data.index = range(len(data) - 1, -1, -1)
+        data["Starting_amount"] = data["SEK Start"] / EUR2SEK + data["EUR Start"]
+        self.data = data[["Month", "External_cost", "Real_income", "Starting_amount"]].sort_values(by=["Month"])
 
         current_finances = 0
         for i in range(len(self.data) - 1, 0, -1):
@@ -157,17 +233,23 @@ class Financials(Notion):
             + sum(self.data["External_cost"][-1:])
         ) / 6
         y, m = list(map(int, self.data.tail(1)["Month"][self.data.index.max()].split("-")))
-        for i in range(5):
-            extcost = extaverage
-
+        months = []
+        for _ in range(5):
             m = (m % 12) + 1
             y = y + 1 if m == 1 else y  # if dec -> jan then increase year
             m_ = f"0{m}" if m < 10 else str(m)
-            month = f"{y}-{m_}"
-
-            self.data.loc[-1] = [month, extcost, 0, current_finances]
-            self.data.index = self.data.index + 1
-            current_finances = 0
+            months.append(f"{y}-{m_}")
+        projected = pd.DataFrame(
+            {
+                "Month": months,
+                "External_cost": extaverage,
+                "Real_income": 0.0,
+                "Starting_amount": [current_finances] + [0.0] * 4,
+            },
+            index=range(4, -1, -1),
+        )
+        self.data.index = self.data.index + len(projected)
+        self.data = pd.concat([self.data, projected])
 
         logging.debug("Financial data\n%s", self.data)
 
@@ -175,54 +257,51 @@ class Financials(Notion):
 class RatesCurrency(Notion):
     "The class for Currency conversion data"
     data: pd.DataFrame
+    schema = [
+        Column("Date", ("Date", "date", "start")),
+        Column("SEK2EUR", ("SEK2EUR", "number"), "float"),
+        Column("DKK2EUR", ("DKK2EUR", "number"), "float"),
+    ]
 
     def get_rates(self) -> None:
-        result_dict = self.fetch_data()
-        self.data = pd.DataFrame(columns=["SEK2EUR"])
-        for item in result_dict:
-            sek2euro = item["properties"]["SEK2EUR"]["number"]
-            self.data.loc[-1] = [sek2euro]
-            self.data.index += 1
+        """One row per currency and date with the units of the currency per EUR, rows without date apply always"""
+        data = self.parse().melt(id_vars="Date", var_name="Currency", value_name="X2EUR").dropna(subset=["X2EUR"])
+        data["Date"] = pd.to_datetime(data["Date"]).fillna(pd.Timestamp("1970-01-01"))
+        data["Currency"] = data["Currency"].str[:3]
+        data["Per EUR"] = 1 / data["X2EUR"]
+        self.data = data[["Date", "Currency", "Per EUR"]].reset_index(drop=True)
 
 
 class RatesDefault(Notion):
     "The class for Default Rates data"
     data: pd.DataFrame
+    schema = [
+        Column("Key", ("Key", "title", 0, "plain_text")),
+        Column("Rate", ("Rate", "number"), "float"),
+        Column("Currency", ("Currency", "select", "name"), default="EUR"),
+    ]
 
     def get_rates(self) -> None:
-        result_dict = self.fetch_data()
-        self.data = pd.DataFrame(columns=["Key", "Rate", "Currency"])
-        for item in result_dict:
-            key = item["properties"]["Key"]["title"][0]["plain_text"]
-            rate = item["properties"]["Rate"]["number"]
-            currency = item["properties"]["Currency"]["select"]["name"]
-            self.data.loc[-1] = [key, rate, currency]
-            self.data.index += 1
+        self.data = self.parse()
 
 
 class RatesExceptions(Notion):
     "The class for Exceptional Rates data"
     data: pd.DataFrame
+    schema = [
+        Column("Key", ("Key", "select", "name")),
+        Column("Rate", ("Rate", "number"), "float"),
+        Column("User", ("User", "title", 0, "plain_text")),
+    ]
 
     def get_rates(self) -> None:
-        result_dict = self.fetch_data()
-        self.data = pd.DataFrame(columns=["Key", "Rate", "User"])
-        for item in result_dict:
-            key = item["properties"]["Key"]["select"]["name"]
-            rate = item["properties"]["Rate"]["number"]
-            user = item["properties"]["User"]["title"][0]["plain_text"]
-            self.data.loc[-1] = [key, rate, user]
-            self.data.index += 1
+        self.data = self.parse()
 
 
 class RatesInternal(Notion):
     "The class for Exceptional Rates data"
     data: pd.DataFrame
+    schema = [Column("Key", ("Key", "title", 0, "plain_text"))]
 
     def get_rates(self) -> None:
-        result_dict = self.fetch_data()
-        self.data = pd.DataFrame(columns=["Key"])
-        for item in result_dict:
-            key = item["properties"]["Key"]["title"][0]["plain_text"]
-            self.data.loc[-1] = [key]
-            self.data.index += 1
+        self.data = self.parse()
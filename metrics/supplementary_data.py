@@ -4,9 +4,12 @@ import json
 import logging
 import os
 
+import numpy as np
 import pandas as pd
 
+from metrics.business_calendar import BusinessCalendar
 from metrics.date_utils import splitMonthTable
+from metrics.tempo_config import CURRENCY_RATES
 
 
 class SupplementaryData:
@@ -15,6 +18,9 @@ class SupplementaryData:
     working_hours: pd.DataFrame
     costs: pd.DataFrame
     financials: pd.DataFrame
+    currency_rates: pd.DataFrame
+    holidays: pd.DataFrame
+    calendar: BusinessCalendar
 
     def __init__(
         self,
@@ -22,6 +28,8 @@ class SupplementaryData:
         working_hours: pd.DataFrame,
         default_rates: pd.DataFrame,
         exceptional_rates: pd.DataFrame,
+        currency_rates: pd.DataFrame = pd.DataFrame(),
+        holidays: pd.DataFrame = pd.DataFrame(),
     ) -> None:
         self.rates = default_rates
         self.working_hours = working_hours
@@ -31,6 +39,47 @@ class SupplementaryData:
         self.internal_keys = pd.DataFrame()
         self.financials = financials
         self.exceptional_rates = exceptional_rates
+        # The defaults apply until the first entry of a currency in the given table
+        self.currency_rates = (
+            pd.concat([CURRENCY_RATES, currency_rates])
+            .drop_duplicates(subset=["Date", "Currency"], keep="last")
+            .sort_values(by="Date", ignore_index=True)
+        )
+        if holidays.empty:
+            holidays = pd.DataFrame(columns=["Date", "Country"])
+        self.holidays = holidays
+        self.calendar = BusinessCalendar(holidays)
+
+    @classmethod
+    def fromFrames(cls, frames: dict[str, pd.DataFrame]) -> "SupplementaryData":
+        """Returns a SupplementaryData holding already loaded frames"""
+        supplementary = cls(
+            pd.DataFrame(),
+            frames["working_hours"],
+            frames["rates"],
+            frames["exceptional_rates"],
+            holidays=frames["holidays"],
+        )
+        supplementary.costs = frames["costs"]
+        supplementary.raw_costs = frames["raw_costs"]
+        return supplementary
+
+    @staticmethod
+    def dailyCosts(monthly: pd.DataFrame, first_month: str) -> pd.DataFrame:
+        """
+        Returns one row per day of the consecutive months from first_month, one per row of monthly,
+        with the costs and the income of the month spread evenly over its days
+        """
+        months = pd.period_range(start=first_month, periods=len(monthly), freq="M")
+        days_in_month = months.days_in_month.to_numpy()
+        month_of_day = np.repeat(np.arange(len(months)), days_in_month)
+        costs = monthly.drop(columns="Month").iloc[month_of_day]
+        costs.index = pd.period_range(start=months[0].start_time, periods=len(month_of_day), freq="D")
+        for column in ["External_cost", "Real_income"]:
+            if column in costs:
+                costs[column] = costs[column] / days_in_month[month_of_day]
+        costs["Date"] = costs.index
+        return costs
 
     def load(self, users: pd.Series) -> None:
         if self.working_hours.empty:
@@ -39,10 +88,7 @@ class SupplementaryData:
             logging.debug(users)
             logging.debug(self.working_hours)
             # Remove users who are not active (alumini)
-            for index, row in self.working_hours.iterrows():
-                not_matches = (users == row["User"]).value_counts().loc[False]
-                if not_matches == users.count():
-                    self.working_hours.drop(index=index, inplace=True)
+            self.working_hours = self.working_hours[self.working_hours["User"].isin(users)]
 
         if self.financials.empty:
             logging.warning("Notion financial table does not exist")
@@ -54,27 +100,15 @@ class SupplementaryData:
             self.costs.index = self.costs["Month"]
             self.costs.index = self.costs.index.map(str)
             self.costs.index = self.costs.index.str[0:4] + "-" + self.costs.index.str[-2:]
-            self.costs.index = pd.period_range(
-                start=self.costs.index.values[0], periods=len(self.costs.index.values), freq="m"
-            )
-            self.costs = self.costs.resample("D").ffill()
-            daily = self.costs.groupby(pd.Grouper(freq="M")).count()
-            daily = daily.iloc[:, 0]
-            daily = daily.resample("D").ffill().rename("days_in_month")
-            self.costs = self.costs.join(daily)
-            self.costs["External_cost"] = self.costs["External_cost"] / self.costs["days_in_month"]
-            if "Real_income" in self.costs:
-                self.costs["Real_income"] = self.costs["Real_income"] / self.costs["days_in_month"]
-            self.costs["Date"] = self.costs.index
-            self.costs = self.costs.drop("days_in_month", axis=1)
-            self.costs = self.costs.drop("Month", axis=1)
+            self.costs = self.dailyCosts(self.costs, self.costs.index.values[0])
             logging.debug("Modified costs%s", self.costs)
             logging.info("Loaded financials")
-            self.rates["User"] = [users.values.tolist() for _ in range(len(self.rates))]
-            self.rates = self.rates.explode("User")
-            self.rates = self.rates.merge(self.exceptional_rates, on=["Key", "User"], how="left")
-            rcol = self.rates["Rate_y"].fillna(self.rates["Rate_x"])
-            self.rates["Rate"] = rcol
-            self.rates = self.rates.drop(columns=["Rate_x", "Rate_y"])
+
+        if not self.rates.empty:
+            # The rates are looked up by TempoData.injectRates, exceptions only apply to keys with a default rate
             self.rates = self.rates.astype({"Rate": "int"})
-            logging.debug("MOdified rates%s", self.rates)
+            if self.exceptional_rates.empty:
+                self.exceptional_rates = pd.DataFrame(columns=["Key", "User", "Rate"])
+            self.exceptional_rates = self.exceptional_rates[self.exceptional_rates["Key"].isin(self.rates["Key"])]
+            self.exceptional_rates = self.exceptional_rates.astype({"Rate": "int"})
+            logging.debug("Modified rates%s", self.rates)
@@ -2,12 +2,34 @@
 
 import pandas as pd
 
+from metrics.api_snapshot import api_snapshot
 from metrics.date_utils import lookBack, monthBegin
 
 START_DATE = pd.Timestamp("2021-01-01")
-TODAY = pd.Timestamp("today")
-YESTERDAY = TODAY - pd.to_timedelta("1day")
-ROLLING_DATE = lookBack(360)
-ALLOCATION_START = monthBegin(lookBack(90))
 EUR2SEK = 11.60
 EUR2DKK = 7.46
+# Units of each currency per EUR, valid from Date on, see SupplementaryData.currency_rates
+CURRENCY_RATES = pd.DataFrame(
+    {"Date": pd.Timestamp("1970-01-01"), "Currency": ["SEK", "DKK"], "Per EUR": [EUR2SEK, EUR2DKK]}
+)
+# Time of these groups is of the given type, other time is Billable if it has a rate and Non-billable if not
+TIME_TYPES = pd.DataFrame({"Group": ["VF"], "Timetype": ["VeriFriday"]})
+
+
+# The dates below move with the clock, so that a long running service sees new days
+
+
+def today() -> pd.Timestamp:
+    return api_snapshot.today()
+
+
+def yesterday() -> pd.Timestamp:
+    return today() - pd.to_timedelta("1day")
+
+
+def rollingDate() -> pd.Timestamp:
+    return lookBack(360, today())
+
+
+def allocationStart() -> str:
+    return monthBegin(lookBack(90, today()))
@@ -3,18 +3,24 @@
 import logging
 import os
 import sys
-from datetime import date
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-from jira import JIRA, Issue
-from jira.client import ResultList
+from jira import JIRA
 from tempoapiclient import client as Client
 
-from metrics.date_utils import lookBack, weekdays
-from metrics.tempo_config import EUR2SEK, YESTERDAY
+from metrics.api_snapshot import JIRA_METHODS, TEMPO_METHODS, api_snapshot
+from metrics.business_calendar import BusinessCalendar
+from metrics.daily_grid import DailyGrid
+from metrics.date_utils import dateBounds, dateSlice, lookBack
+from metrics.jira_data import IssueResolver, UserDirectory
+from metrics.memory import downcast
+from metrics.tempo_config import CURRENCY_RATES, TIME_TYPES, today, yesterday
+from metrics.user_index import UserIndex
+from metrics.worklog_store import WorklogStore
 
 
 class TempoData:
@@ -22,11 +28,18 @@ class TempoData:
 
     client: Client.Tempo
     jira_client: JIRA
+    worklog_store: Optional[WorklogStore]
+    issue_resolver: IssueResolver
+    user_directory: UserDirectory
     raw: pd.DataFrame
     data: pd.DataFrame
-    padded_data: pd.DataFrame
+    grid: Optional[DailyGrid]
+    user_index: Optional[tuple[pd.DataFrame, UserIndex]]
+    daily_cube: Optional[tuple[pd.DataFrame, pd.DataFrame, dict]]
+    date_index: Optional[tuple[pd.DataFrame, np.ndarray, np.ndarray, dict]]
     this_year: int
     last_year: int
+    lean: bool
 
     def __init__(
         self,
@@ -35,34 +48,107 @@ class TempoData:
         jira_base_url: str = "https://verifa.atlassian.net",
         jira_user: Optional[str] = None,
         jira_api_token: Optional[str] = None,
+        worklog_store: Optional[WorklogStore] = None,
+        issue_resolver: Optional[IssueResolver] = None,
+        user_directory: Optional[UserDirectory] = None,
+        lean: bool = False,
     ) -> None:
-        tempo_key = tempo_key or os.environ.get("TEMPO_KEY")
-        if tempo_key is None:
-            sys.exit("Tempo key not provided or TEMPO_KEY not set")
-        jira_user = jira_user or os.environ.get("JIRA_USER")
-        if jira_user is None:
-            sys.exit("Jira User not provided or JIRA_USER not set")
-        jira_api_token = jira_api_token or os.environ.get("JIRA_API_TOKEN")
-        if jira_api_token is None:
-            sys.exit("Jira API token not provided or JIRA_API_TOKEN not set")
-        self.client = Client.Tempo(auth_token=tempo_key, base_url=tempo_base_url)
-        self.jira_client = JIRA(server=jira_base_url, basic_auth=(jira_user, jira_api_token))
+        if api_snapshot.replaying:
+            # No credentials or connections needed, all responses come from the snapshot
+            self.client = api_snapshot.proxy("tempo", None, TEMPO_METHODS)
+            self.jira_client = api_snapshot.proxy("jira", None, JIRA_METHODS)
+        else:
+            tempo_key = tempo_key or os.environ.get("TEMPO_KEY")
+            if tempo_key is None:
+                sys.exit("Tempo key not provided or TEMPO_KEY not set")
+            jira_user = jira_user or os.environ.get("JIRA_USER")
+            if jira_user is None:
+                sys.exit("Jira User not provided or JIRA_USER not set")
+            jira_api_token = jira_api_token or os.environ.get("JIRA_API_TOKEN")
+            if jira_api_token is None:
+                sys.exit("Jira API token not provided or JIRA_API_TOKEN not set")
+            tempo_client = Client.Tempo(auth_token=tempo_key, base_url=tempo_base_url)
+            jira_client = JIRA(server=jira_base_url, basic_auth=(jira_user, jira_api_token))
+            self.client = api_snapshot.proxy("tempo", tempo_client, TEMPO_METHODS)
+            self.jira_client = api_snapshot.proxy("jira", jira_client, JIRA_METHODS)
+        self.worklog_store = worklog_store
+        self.issue_resolver = issue_resolver or IssueResolver()
+        self.user_directory = user_directory or UserDirectory()
         self.raw = pd.DataFrame()
         self.data = pd.DataFrame()
         self.issues = pd.DataFrame()
-
-    def load(self, from_date: str = "1970-01-01", to_date: str = str(date.today()), crew=pd.DataFrame()) -> None:
-        """Fetch and populate data from Tempo for the given date range"""
-
-        # Fetch data from tempo
-        logs = self.client.get_worklogs(dateFrom=from_date, dateTo=to_date)
-        self.raw = pd.json_normalize(logs)
-        self.data = self.raw[["issue.id", "timeSpentSeconds", "billableSeconds", "startDate", "author.accountId"]]
-        self.data.columns = ["IssueId", "Time", "Billable", "Date", "UserId"]
-
-        # Merge the data
-        issues = self.allJiraIssues()
-        users = self.allJiraUsers()
+        self.user_index = None
+        self.daily_cube = None
+        self.date_index = None
+        self.grid = None
+        self.lean = lean
+
+    @classmethod
+    def fromFrames(cls, data: pd.DataFrame, worklog_store: Optional[WorklogStore] = None) -> "TempoData":
+        """
+        Returns a TempoData without API clients, holding already processed data
+        the worklog store, if any, is the one the data was synced from
+        """
+        tempo = cls.__new__(cls)
+        tempo.worklog_store = worklog_store
+        tempo.raw = pd.DataFrame()
+        tempo.issues = pd.DataFrame()
+        tempo.user_index = None
+        tempo.daily_cube = None
+        tempo.date_index = None
+        tempo.grid = None
+        tempo.lean = False
+        tempo.data = data
+        tempo.this_year = tempo.data["Year"].unique().max()
+        tempo.last_year = tempo.this_year - 1
+        return tempo
+
+    def load(self, from_date: str = "1970-01-01", to_date: Optional[str] = None, crew=pd.DataFrame()) -> None:
+        """Fetch and populate data from Tempo for the given date range, up to today by default"""
+        to_date = to_date or str(today().date())
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            # The user directory does not depend on the worklogs, so it is refreshed in the meantime
+            directory_future = pool.submit(self.user_directory.refresh, self.jira_client)
+
+            # Fetch data from tempo, only the changes since the last sync if there is a local store
+            if self.worklog_store is None:
+                logs = self.client.get_worklogs(dateFrom=from_date, dateTo=to_date)
+            else:
+                logs = self.worklog_store.sync(self.client, from_date, to_date)
+            if self.lean:
+                # Only the used fields, without the full normalised frame
+                self.raw = pd.DataFrame()
+                self.data = pd.DataFrame(
+                    [
+                        [
+                            log["issue"]["id"],
+                            log["timeSpentSeconds"],
+                            log["billableSeconds"],
+                            log["startDate"],
+                            log["author"]["accountId"],
+                        ]
+                        for log in logs
+                    ],
+                    columns=["IssueId", "Time", "Billable", "Date", "UserId"],
+                )
+            else:
+                self.raw = pd.json_normalize(logs)
+                self.data = self.raw[
+                    ["issue.id", "timeSpentSeconds", "billableSeconds", "startDate", "author.accountId"]
+                ]
+                self.data.columns = ["IssueId", "Time", "Billable", "Date", "UserId"]
+
+            # Merge the data, only the issues referenced by the worklogs are looked up
+            issues = self.issue_resolver.resolve(self.jira_client, self.data["IssueId"])
+            if self.worklog_store is not None:
+                # The worklogs of issues with a new key change their group without changing themselves
+                moved = self.data.loc[self.data["IssueId"].isin(self.issue_resolver.changed), "Date"]
+                if not moved.empty:
+                    self.worklog_store.markChanged(moved.min())
+            directory_future.result()
+            # Authors missing from the directory are looked up one by one
+            users = self.user_directory.resolve(self.jira_client, self.data["UserId"])
         self.data = self.data.merge(issues, on="IssueId")
         self.data = self.data.merge(users, on="UserId")
 
@@ -74,38 +160,46 @@ class TempoData:
         self.data.loc[:, ("Billable")] = self.data.loc[:, ("Billable")] / 3600
         self.data.loc[:, ("Internal")] = self.data.loc[:, ("Time")] - self.data.loc[:, ("Billable")]
         self.data.loc[:, ("Year")] = self.data.loc[:, ("Date")].dt.year
+        if self.lean:
+            # The hours are whole seconds, float32 keeps them to well within a second
+            self.data = downcast(self.data, ["IssueId", "Year", "Time", "Billable", "Internal"], tolerance=0.5 / 3600)
         self.this_year = self.data["Year"].unique().max()
         self.last_year = self.this_year - 1
 
-    def allJiraIssues(self) -> pd.DataFrame:
-        """Fetches all the JIRA issues with IssueId and Key columns as DataFrame"""
-        start_at = 0
-        res_raw: ResultList[Issue] = ResultList([])
-        while True:
-            issues = self.jira_client.search_issues(
-                jql_str="ORDER BY created DESC", maxResults=1000, startAt=start_at
-            )  # this returns only 100 everytime
-            if len(issues) == 0:
-                break
-            res_raw.extend(issues)
-            start_at += len(issues)
-        res = map(lambda r: [int(r.id), r.key], res_raw)
-        jira = pd.DataFrame(res)
-        jira.columns = ["IssueId", "Key"]
-        return jira
+    def frames(self) -> dict:
+        """returns the frames and arrays held, by name, for memory reports"""
+        frames = {"raw": self.raw, "data": self.data}
+        if self.grid is not None:
+            frames.update({f"grid {column}": values for column, values in self.grid.values.items()})
+        return frames
 
     def allJiraUsers(self) -> pd.DataFrame:
         """Fetches all the JIRA users with UserId and User coloums as DataFrame"""
-        raw_users = self.jira_client.search_users(startAt=0, maxResults=200, query="*")
-        _res = map(lambda r: [r.displayName, r.accountId], raw_users)
-        users = pd.DataFrame(_res)
-        users.columns = ["User", "UserId"]
-        return users
-
-    def injectRates(self, rates: pd.DataFrame) -> None:
-        """Modify data by merging in the given rates data"""
-        uprated = self.data.merge(rates, on=["Key", "User"], how="left")
-        uprated["Rate"] = uprated.apply(lambda x: x["Rate"] / EUR2SEK if x["Currency"] == "SEK" else x["Rate"], axis=1)
+        users = pd.DataFrame(self.user_directory.fetchAll(self.jira_client).items(), columns=["UserId", "User"])
+        return users[["User", "UserId"]]
+
+    def injectRates(
+        self,
+        rates: pd.DataFrame,
+        currency_rates: pd.DataFrame = CURRENCY_RATES,
+        exceptional_rates: pd.DataFrame = pd.DataFrame(columns=["Key", "User", "Rate"]),
+    ) -> None:
+        """
+        Modify data by adding the Rate and Currency of every entry.
+        The rate of an entry is the exceptional rate of its key and user if there is one,
+        or else the default rate of its key. Both are looked up by their keys, without pairing keys and users.
+        Rates in other currencies are converted to EUR with the currency rate valid on the date of each entry.
+        """
+        defaults = rates.drop_duplicates(subset="Key", keep="last").set_index("Key")
+        exceptions = exceptional_rates.drop_duplicates(subset=["Key", "User"], keep="last").set_index(["Key", "User"])
+        exception = exceptions["Rate"].reindex(pd.MultiIndex.from_frame(self.data[["Key", "User"]])).to_numpy(float)
+        uprated = self.data.assign(Currency=self.data["Key"].map(defaults["Currency"]))
+        uprated["Rate"] = uprated["Key"].map(defaults["Rate"]).where(np.isnan(exception), exception)
+        dated = uprated[["Date", "Currency"]].reset_index().sort_values(by="Date", kind="stable")
+        dated = pd.merge_asof(dated, currency_rates.sort_values(by="Date"), on="Date", by="Currency")
+        # EUR, and currencies without currency rates, are used as is
+        per_eur = dated.set_index("index")["Per EUR"].reindex(uprated.index).fillna(1.0)
+        uprated["Rate"] = uprated["Rate"] / per_eur
         uprated["Income"] = uprated["Rate"] * uprated["Billable"]
         self.data = uprated
 
@@ -113,51 +207,83 @@ class TempoData:
         """returns list of users"""
         return self.data["User"].drop_duplicates()
 
+    def dailyCube(self) -> pd.DataFrame:
+        """
+        returns the sums of the hours and income per date, user and issue key, with the group and rate of the key.
+        It is built once per data and shared by the views below.
+        """
+        return self.dailyCubeRollups()[0]
+
+    def dailyCubeRollups(self) -> tuple[pd.DataFrame, dict]:
+        """returns the daily cube and the views cached with it, both replaced with data"""
+        if self.daily_cube is None or self.daily_cube[0] is not self.data:
+            measures = [column for column in ["Time", "Billable", "Internal", "Income"] if column in self.data]
+            grouped = self.data.groupby(["Date", "User", "Key", "Group"], as_index=False)
+            cube = grouped[measures].sum()
+            if "Rate" in self.data:
+                # The rate of a user and key is the same all day
+                cube["Rate"] = grouped["Rate"].first()["Rate"]
+            self.daily_cube = (self.data, cube, {})
+        return self.daily_cube[1], self.daily_cube[2]
+
+    def rollup(self, by: list[str], columns: list[str]) -> pd.DataFrame:
+        """returns the sums of columns grouped by, from the daily cube, cached until data is replaced"""
+        cube, rollups = self.dailyCubeRollups()
+        if (tuple(by), tuple(columns)) not in rollups:
+            rollups[(tuple(by), tuple(columns))] = cube.groupby(by, as_index=False)[columns].sum()
+        return rollups[(tuple(by), tuple(columns))]
+
     def byGroup(self) -> pd.DataFrame:
         """returns aggregated time and billable time grouped by date, user and group"""
-        return self.data.groupby(["Date", "User", "Group"], as_index=False)[["Time", "Billable"]].sum()
+        return self.rollup(["Date", "User", "Group"], ["Time", "Billable"])
 
-    def byTimeType(self) -> pd.DataFrame:
+    def timeType(self, time_types: pd.DataFrame = TIME_TYPES, frame: Optional[pd.DataFrame] = None) -> pd.Series:
+        """
+        returns the time type of every row in frame, data by default, from the Group rules in time_types
+        or else the Rate
+        """
+        frame = self.data if frame is None else frame
+        by_rate = np.where(frame["Rate"].isna(), "Non-billable", "Billable")
+        by_group = frame["Group"].map(time_types.set_index("Group")["Timetype"])
+        return by_group.fillna(pd.Series(by_rate, index=frame.index)).rename("Timetype")
+
+    def byTimeType(self, time_types: pd.DataFrame = TIME_TYPES) -> pd.DataFrame:
         """returns aggregated time and time type grouped by date, user and group"""
-        newdata = self.data.copy()
-        newdata["Timetype"] = pd.isna(newdata["Rate"])
-        newdata["Timetype"] = ["Billable" if not (x) else "Non-billable" for x in newdata["Timetype"]]
-        newdata["Timetype"] = [
-            "VeriFriday" if x == "VF" else newdata["Timetype"][idx] for idx, x in enumerate(newdata["Group"])
-        ]
-        return newdata.groupby(["Date", "Timetype", "Group"], as_index=False)[["Time", "Timetype"]].sum(
-            numeric_only=True
-        )
+        cube = self.dailyCube()
+        return cube.groupby(["Date", self.timeType(time_types, cube), "Group"])[["Time"]].sum().reset_index()
 
     def byTotalGroup(self, days_back) -> pd.DataFrame:
         """returns aggregated billable time grouped by issue key group and user"""
-        timed_data = self.data[self.data["Date"] > lookBack(days_back)]
+        cube = self.dailyCube()
+        timed_data = dateSlice(cube, lookBack(days_back))
         df = timed_data.groupby(["Group", "User"], as_index=False)[["Billable"]].sum()
-        df["Billable"].replace(0, np.nan, inplace=True)
-        df.dropna(subset=["Billable"], inplace=True)
-        return df
+        return df[df["Billable"] != 0]
 
     def byEggBaskets(self) -> pd.DataFrame:
         """returns aggregated billable income grouped by issue key group, user and time box (30, 60, 90)"""
-        baskets = self.data.copy()
-        baskets["TimeBasket"] = "0"
-        baskets.loc[baskets["Date"] > lookBack(90), "TimeBasket"] = "60-90 days ago"
-        baskets.loc[baskets["Date"] > lookBack(60), "TimeBasket"] = "30-60 days ago"
-        baskets.loc[baskets["Date"] > lookBack(30), "TimeBasket"] = "0-30 days ago"
-        baskets["TimeBasket"].replace("0", np.nan, inplace=True)
-        baskets.dropna(subset=["TimeBasket"], inplace=True)
+        cube = self.dailyCube()
+        baskets = dateSlice(cube, lookBack(90))[["Group", "User", "Date", "Income"]]
+        baskets["TimeBasket"] = np.select(
+            [baskets["Date"] > lookBack(30), baskets["Date"] > lookBack(60)],
+            ["0-30 days ago", "30-60 days ago"],
+            "60-90 days ago",
+        )
         df = baskets.groupby(["Group", "User", "TimeBasket"], as_index=False)[["Income"]].sum()
-        df["Income"].replace(0, np.nan, inplace=True)
-        df.dropna(subset=["Income"], inplace=True)
-        return df
+        return df[df["Income"] != 0]
 
     def byDay(self) -> pd.DataFrame:
         """returns aggregated time and billable time grouped by date, user and issue key"""
-        return self.data.groupby(["Date", "User", "Key"], as_index=False)[["Time", "Billable"]].sum()
+        return self.rollup(["Date", "User", "Key"], ["Time", "Billable"])
+
+    def userIndex(self) -> UserIndex:
+        """returns the per user index of the Time in data, rebuilt when data has been replaced"""
+        if self.user_index is None or self.user_index[0] is not self.data:
+            self.user_index = (self.data, UserIndex(self.data, "Time"))
+        return self.user_index[1]
 
     def firstEntry(self, user, start) -> pd.Timestamp:
         if start == "*":
-            first = self.data[self.data["User"] == user]["Date"].min()
+            first = self.userIndex().first(user)
         else:
             first = start
 
@@ -165,32 +291,28 @@ class TempoData:
 
     def lastEntry(self, user, stop) -> pd.Timestamp:
         if stop == "*":
-            data = self.data[self.data["Date"] < pd.to_datetime("today")]
-            last = data[data["User"] == user]["Date"].max()
+            last = self.userIndex().last(user, before=today())
         else:
             last = stop
 
         return pd.Timestamp(last)
 
     def totalHours(self, user, start, stop=None):
-        data = self.data[self.data["User"] == user]
-        data = data[data["Date"] >= pd.to_datetime(start)]
-        if stop is None:
-            total = data["Time"].sum()
-        else:
-            total = data[data["Date"] <= pd.to_datetime(stop)]["Time"].sum()
-
-        return total
+        return self.userIndex().total(user, start, stop)
 
-    def byUser(self, working_hours: pd.DataFrame) -> pd.DataFrame:
-        """returns aggregated time and billable time grouped by user"""
+    def byUser(self, working_hours: pd.DataFrame, calendar: Optional[BusinessCalendar] = None) -> pd.DataFrame:
+        """
+        returns aggregated time and billable time grouped by user,
+        business days are counted with the weekmask and the holidays of the user's country
+        """
+        calendar = calendar or BusinessCalendar()
         user_data = pd.DataFrame()
         if not working_hours.empty:
             user_data = working_hours[working_hours["Stop"] == "*"]
             user_data["Trend"] = 0
             user_data["First"] = [self.firstEntry(u, s).date() for u, s in zip(user_data["User"], user_data["Start"])]
             user_data["Last"] = [self.lastEntry(u, s).date() for u, s in zip(user_data["User"], user_data["Stop"])]
-            user_data["Days"] = [weekdays(f, t) for f, t in zip(user_data["First"], user_data["Last"])]
+            user_data["Days"] = calendar.countRows(user_data, user_data["First"], user_data["Last"])
             user_data["Expected"] = [days * daily for days, daily in zip(user_data["Days"], user_data["Daily"])]
 
             user_data["Total"] = [
@@ -205,11 +327,14 @@ class TempoData:
                     user_data["User"], user_data["Last"] - pd.to_timedelta("6day"), user_data["Last"]
                 )
             ]
-            user_data["Trend"] = [
-                last_week - 5 * daily for daily, last_week in zip(user_data["Daily"], user_data["Last 7 days"])
-            ]
+            last_week_days = calendar.countRows(
+                user_data, user_data["Last"] - pd.to_timedelta("6day"), user_data["Last"]
+            )
+            user_data["Trend"] = user_data["Last 7 days"] - last_week_days * user_data["Daily"]
             logging.debug("\n%s", user_data.to_string())
-            user_data = user_data.drop(["Daily", "Start", "Stop", "First", "Days", "Expected", "Total"], axis="columns")
+            user_data = user_data.drop(
+                ["Daily", "Start", "Stop", "First", "Days", "Expected", "Total"], axis="columns"
+            ).drop(["Country", "Weekmask"], axis="columns", errors="ignore")
 
         else:
             # Find the first time entry for each user
@@ -226,19 +351,22 @@ class TempoData:
             # add the column to the user data
             user_data = pd.merge(user_data, user_first, on="User")
             # remove today
-            user_last = self.data[self.data["Date"] < pd.Timestamp("today").strftime("%b %d, %Y")]
+            user_last = self.data[self.data["Date"] < today().floor("D")]
             user_last = user_last.groupby("User", as_index=False)["Date"].max()
             user_last.columns = ["User", "Last"]
             user_last["Last"] = [x.date() for x in user_last["Last"]]
             user_data = pd.merge(user_data, user_last, on="User")
-            user_data["Days"] = [weekdays(f, t) for f, t in zip(user_data["First"], user_data["Last"])]
+            user_data["Days"] = calendar.count(user_data["First"], user_data["Last"])
 
         return user_data
 
     def tableByUser(
-        self, working_hours, fnTableHeight=None, color_head="paleturquoise", color_cells="lavender"
+        self, working_hours, fnTableHeight=None, color_head="paleturquoise", color_cells="lavender", by_user=None
     ) -> go.Figure:
-        table_working_hours = self.byUser(working_hours).sort_values(by="Last").round(2)
+        """by_user is the result of byUser(working_hours) if already computed"""
+        if by_user is None:
+            by_user = self.byUser(working_hours)
+        table_working_hours = by_user.sort_values(by="Last").round(2)
         if not working_hours.empty:
             cell_values = [
                 table_working_hours["User"],
@@ -276,13 +404,20 @@ class TempoData:
 
     # Collect the missing rates and replace with '???'
     def rawRatesTable(self) -> pd.DataFrame:
-        rate_data = self.data[self.data["Billable"] > 0]
-        rate_data = rate_data.groupby(["Key", "Rate"], dropna=False, as_index=False).agg(
-            Hours=("Billable", np.sum), Users=("User", ", ".join)
-        )
-        rate_data["Rate"].replace(np.nan, "???", inplace=True)
-        rate_data["Users"] = rate_data["Users"].str.split(", ").map(set).str.join(", ")
-        return rate_data
+        """
+        returns the billable hours and the users of every key and rate, "???" for a missing rate.
+        It is computed once from the daily cube and shared by the rates tables.
+        """
+        cube, rollups = self.dailyCubeRollups()
+        if "rates" not in rollups:
+            billable = cube[cube["Billable"] > 0]
+            by_user = billable.groupby(["Key", "Rate", "User"], dropna=False, as_index=False)["Billable"].sum()
+            rate_data = by_user.groupby(["Key", "Rate"], dropna=False, as_index=False).agg(
+                Hours=("Billable", "sum"), Users=("User", ", ".join)
+            )
+            rate_data["Rate"] = rate_data["Rate"].astype(object).where(rate_data["Rate"].notna(), "???")
+            rollups["rates"] = rate_data
+        return rollups["rates"]
 
     def ratesTable(self, fnTableHeight=None, color_head="paleturquoise", color_cells="lavender") -> go.Figure:
         rate_data = self.rawRatesTable()
@@ -326,72 +461,56 @@ class TempoData:
             fig.update_layout(height=fnTableHeight(rate_data))
         return fig
 
-    def padTheData(self, working_hours: pd.DataFrame) -> None:
+    def buildGrid(self, working_hours: pd.DataFrame, previous: Optional[DailyGrid] = None, inputs: str = "") -> None:
         """
-        creates the self.padded_data padded with zero data
-        for each User, an entry for the ZP group will be added for each date >= min(Date) && <= max(Date)
-        Key: ZP-1, Time: 0, Billable: 0, Group: ZP, Internal: 0, Currency: EUR, Rate: 0, Income: 0
+        creates self.grid with the daily sums of Time, Billable, Internal and Income per user
+        each user is padded with zero days from Start to Stop of their working hours, "*" meaning the first
+        entry of the user and yesterday, or from the first to the last entry without working hours
+        the previous grid is reused for the days before the first worklog changed by the syncs since it was built,
+        if inputs, a key of everything else the data was processed with, is the same
         """
-        self.padded_data = self.data
         if not working_hours.empty:
-            for _, row in working_hours.iterrows():
-                df_user = pd.DataFrame()
-                user = row["User"]
-                if row["Start"] == "*":
-                    start = self.data[self.data["User"] == user]["Date"].min()
-                else:
-                    start = row["Start"]
-                if row["Stop"] == "*":
-                    stop = YESTERDAY
-                else:
-                    stop = row["Stop"]
-                df_user["Date"] = pd.date_range(start, stop)
-                df_user["User"] = user
-                df_user["Key"] = "ZP-1"
-                df_user["Time"] = 0.0
-                df_user["Billable"] = 0.0
-                df_user["Group"] = "ZP"
-                df_user["Internal"] = 0.0
-                df_user["Year"] = df_user.loc[:, ("Date")].dt.year
-                df_user["Currency"] = "EUR"
-                df_user["Rate"] = 0
-                df_user["Income"] = 0
-                self.padded_data = pd.concat([self.padded_data, df_user])
+            first = self.data.groupby("User")["Date"].min()
+            padding = working_hours[["User", "Start", "Stop"]]
+            padding = padding[padding["User"].isin(first.index)]
+            padding = pd.DataFrame(
+                {
+                    "User": padding["User"],
+                    "Start": pd.to_datetime(
+                        padding["Start"].where(padding["Start"] != "*", padding["User"].map(first))
+                    ),
+                    "Stop": pd.to_datetime(padding["Stop"].where(padding["Stop"] != "*", yesterday())),
+                }
+            )
         else:
-            for user in self.data["User"].unique():
-                df_user = pd.DataFrame()
-                start = self.data[self.data["User"] == user]["Date"].min()
-                stop = self.data[self.data["User"] == user]["Date"].max()
-                df_user["Date"] = pd.date_range(start, stop)
-                df_user["User"] = user
-                df_user["Key"] = "ZP-1"
-                df_user["Time"] = 0.0
-                df_user["Billable"] = 0.0
-                df_user["Group"] = "ZP"
-                df_user["Internal"] = 0.0
-                df_user["Year"] = df_user.loc[:, ("Date")].dt.year
-                df_user["Currency"] = "EUR"
-                df_user["Rate"] = 0
-                df_user["Income"] = 0
-                self.padded_data = pd.concat([self.padded_data, df_user])
+            padding = self.data.groupby("User", as_index=False).agg(Start=("Date", "min"), Stop=("Date", "max"))
+        columns = [column for column in ["Time", "Billable", "Internal", "Income"] if column in self.data]
+        since, synced = None, 0
+        if self.worklog_store is not None:
+            synced = self.worklog_store.generation
+            since = self.worklog_store.changedSince(previous.synced) if previous is not None else None
+        self.grid = DailyGrid(self.data, columns, padding, previous, since, inputs, synced)
+        logging.info(
+            "Daily grid: summed the last %s of %s days", len(self.grid.dates) - self.grid.since, len(self.grid.dates)
+        )
+
+    def dailyGrid(self) -> DailyGrid:
+        """returns self.grid, which buildGrid() creates"""
+        if self.grid is None:
+            raise ValueError("The daily grid is not built, call buildGrid() first")
+        return self.grid
 
     def userRolling7(self, to_sum) -> pd.DataFrame:
         """returns rolling 7 day sums for Billable and non Billable time grouped by user"""
-        daily_sum = self.padded_data.groupby(["Date", "User"], as_index=False)[to_sum].sum()
-        rolling_sum_7d = (
-            daily_sum.set_index("Date").groupby(["User"], as_index=False).rolling("7d", min_periods=7)[to_sum].sum()
-        )
-        return rolling_sum_7d.reset_index(inplace=False)
+        return self.dailyGrid().userRolling(to_sum)
 
     def teamRolling7(self, to_sum) -> pd.DataFrame:
         """returns rolling 7 day sums for Billable and non Billable time grouped by user"""
-        daily_sum = self.padded_data.groupby(["Date"], as_index=False)[to_sum].sum()
-        rolling_sum_7d = daily_sum.set_index("Date").rolling("7d", min_periods=7)[to_sum].sum()
-        return rolling_sum_7d.reset_index(inplace=False)
+        return self.dailyGrid().teamRolling(to_sum)
 
     def teamRolling7Relative(self, costs: pd.Series) -> pd.DataFrame:
         """returns rolling 7 day sums for Billable and non Billable time grouped by user, relative to the costs"""
-        daily_sum = self.padded_data.groupby(["Date"], as_index=False)["Income"].sum()
+        daily_sum = self.dailyGrid().teamDaily("Income")
         daily_cost = costs
         daily_cost["Date"] = daily_cost["Date"].astype("datetime64[M]")
 
@@ -409,22 +528,51 @@ class TempoData:
 
     def thisYear(self) -> pd.DataFrame:
         """returns a dataFrame with entries for the current year"""
-        return self.data[self.data["Year"] == float(self.this_year)]
+        return self.getYear(self.this_year)
 
     def lastYear(self) -> pd.DataFrame:
         """returns a dataFrame with entries for the previous year"""
-        return self.data[self.data["Year"] == float(self.last_year)]
+        return self.getYear(self.last_year)
 
     def getYear(self, year) -> pd.DataFrame:
-        """returns a dataFrame with entries for the given year"""
-        return self.data[self.data["Year"] == float(year)]
+        """returns a dataFrame with entries for the given year, kept until data is replaced"""
+        years = self.dateIndex()[2]
+        year = int(year)
+        if year not in years:
+            years[year] = self.dateRange(pd.Timestamp(year - 1, 12, 31), pd.Timestamp(year, 12, 31))
+        return years[year]
+
+    def dateIndex(self) -> tuple[np.ndarray, np.ndarray, dict]:
+        """
+        returns the positions of the entries in data sorted by date, their dates and the entries per year
+        rebuilt when data has been replaced
+        """
+        if self.date_index is None or self.date_index[0] is not self.data:
+            dates = self.data["Date"].to_numpy()
+            order = np.argsort(dates, kind="stable")
+            self.date_index = (self.data, order, dates[order], {})
+        return self.date_index[1:]
+
+    def dateRange(self, after=None, until=None) -> pd.DataFrame:
+        """
+        returns a dataFrame with entries after and until the given dates, in the order of data
+        the entries are found by binary search in the sorted dates, data itself keeps its order
+        as the figures color their traces in order of appearance
+        """
+        order, dates, _ = self.dateIndex()
+        start, stop = dateBounds(dates, after, until)
+        return self.data.iloc[np.sort(order[start:stop])]
 
     def zeroOutBillableTime(self, keys: pd.DataFrame) -> None:
         """
         Sets billable time to zero (0) and actual time to 'internal' for internal project keys
         """
         if not keys.empty:
-            for key in keys["Key"]:
-                logging.debug("Internal Key: %s", key)
-                self.data.loc[self.data["Group"] == key, ("Billable")] = 0
-                self.data.loc[self.data["Group"] == key, ("Internal")] = self.data[self.data["Group"] == key]["Time"]
+            logging.debug("Internal Keys: %s", list(keys["Key"]))
+            internal = self.data["Group"].isin(keys["Key"])
+            # The data is changed in place, views built before are outdated
+            self.daily_cube = None
+            self.user_index = None
+            self.date_index = None
+            self.data.loc[internal, ("Billable")] = 0
+            self.data.loc[internal, ("Internal")] = self.data.loc[internal, ("Time")]
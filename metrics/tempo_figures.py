@@ -1,13 +1,12 @@
 """The figures module"""
 
 import logging
-from datetime import date
 
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
-from metrics.tempo_config import EUR2DKK, EUR2SEK, ROLLING_DATE
+from metrics.tempo_config import EUR2DKK, EUR2SEK, rollingDate, today
 
 
 # =========================================================
@@ -136,7 +135,7 @@ def figureFinancialTotal(supplementary_data, year=None):
 
 def figureNormalisedIndividual(user_data):
     figure = px.scatter(
-        user_data[user_data["Date"] > ROLLING_DATE],
+        user_data[user_data["Date"] > rollingDate()],
         x="Date",
         y=["%-billable", "%-internal"],
         facet_col="User",
@@ -172,7 +171,7 @@ def figureNormalisedTeam(team_data, last_date):
     figure.update_layout(title="Normalised team data", yaxis_title="Work time [%]")
     figure.update_layout(
         xaxis_rangeslider_visible=True,
-        xaxis_range=[ROLLING_DATE, str(date.today())],
+        xaxis_range=[rollingDate(), str(today().date())],
     )
     figure.add_vrect(
         x0=last_date,
@@ -198,7 +197,7 @@ def figureNormalisedTeam(team_data, last_date):
 
 def figureRollingIncomeIndividual(df_user_income_rolling):
     figure = px.scatter(
-        df_user_income_rolling[df_user_income_rolling["Date"] > ROLLING_DATE],
+        df_user_income_rolling[df_user_income_rolling["Date"] > rollingDate()],
         x="Date",
         y="Income",
         facet_col="User",
@@ -229,7 +228,7 @@ def figureRollingIncomeTeam(df_average_income_rolling_30, last_date):
     )
     figure.update_layout(
         xaxis_rangeslider_visible=True,
-        xaxis_range=[ROLLING_DATE, str(date.today())],
+        xaxis_range=[rollingDate(), str(today().date())],
     )
     figure.update_layout(legend=dict(title="", orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.75))
     figure.add_vrect(
@@ -297,7 +296,7 @@ def figureRollingTotal(df_team_rolling_total, supplementary_data):
 def figureSpentTimePercentage(tempo_data):
     df_by_group = tempo_data.byTimeType().sort_values("Group")
     figure = px.histogram(
-        df_by_group[df_by_group["Date"] > ROLLING_DATE],
+        df_by_group[df_by_group["Date"] > rollingDate()],
         x="Date",
         y="Time",
         color="Timetype",
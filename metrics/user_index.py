@@ -0,0 +1,52 @@
+"""Per user index of the worklog dates with cumulative hours"""
+
+from typing import Literal
+
+import numpy as np
+import pandas as pd
+
+
+class UserIndex:
+    """
+    The dates of every user sorted, with the cumulative sum of a column in the same order.
+
+    The first and last entries of a user and the total over a date range are binary searches
+    in the slice of the user, instead of masking the whole frame.
+    """
+
+    dates: np.ndarray
+    cumulative: np.ndarray
+    slices: dict[str, tuple[int, int]]
+
+    def __init__(self, data: pd.DataFrame, column: str = "Time") -> None:
+        ordered = data[["User", "Date", column]].sort_values(by=["User", "Date"], kind="stable")
+        self.dates = ordered["Date"].to_numpy(dtype="datetime64[ns]")
+        self.cumulative = np.concatenate([[0.0], np.cumsum(ordered[column].fillna(0).to_numpy(dtype=float))])
+        users = ordered["User"].to_numpy()
+        bounds = np.flatnonzero(np.concatenate([[True], users[1:] != users[:-1], [True]]))
+        self.slices = {users[start]: (start, stop) for start, stop in zip(bounds[:-1], bounds[1:])}
+
+    def search(self, user: str, date, side: Literal["left", "right"] = "left") -> int:
+        """Position of date within the dates of the user, as np.searchsorted"""
+        start, stop = self.slices[user]
+        return start + int(np.searchsorted(self.dates[start:stop], np.datetime64(pd.Timestamp(date)), side=side))
+
+    def first(self, user: str) -> pd.Timestamp:
+        start, stop = self.slices.get(user, (0, 0))
+        return pd.Timestamp(self.dates[start]) if stop > start else pd.NaT
+
+    def last(self, user: str, before=None) -> pd.Timestamp:
+        """The last date of the user, or the last one before the given date"""
+        if user not in self.slices:
+            return pd.NaT
+        start, stop = self.slices[user]
+        position = stop if before is None else self.search(user, before)
+        return pd.Timestamp(self.dates[position - 1]) if position > start else pd.NaT
+
+    def total(self, user: str, start, stop=None) -> float:
+        """Sum of the column for the user from start to stop, both included"""
+        if user not in self.slices:
+            return 0.0
+        begin = self.search(user, start)
+        end = self.slices[user][1] if stop is None else max(begin, self.search(user, stop, side="right"))
+        return float(self.cumulative[end] - self.cumulative[begin])
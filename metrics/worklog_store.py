@@ -0,0 +1,169 @@
+"""Local store for Tempo worklogs with incremental sync"""
+
+import gzip
+import json
+import logging
+import os
+from typing import Optional, cast
+
+import pandas as pd
+from tempoapiclient import client as Client
+
+from metrics.constants import TEMPO_FULL_SYNC_DAYS, TEMPO_RECONCILE_DAYS
+
+STORE_VERSION = 1
+
+
+def _day(value) -> str:
+    return str(pd.Timestamp(value).date())
+
+
+class WorklogStore:
+    """
+    Raw Tempo worklogs keyed by worklog id, optionally persisted to disk.
+
+    The first sync downloads the full date range. Later syncs only ask Tempo for worklogs
+    updated since the last watermark, and re-read a recent window to detect deletions,
+    since Tempo does not report deleted worklogs through `updatedFrom`.
+
+    The first day changed by each sync is kept in memory, so that sums of the days before it can be reused.
+    """
+
+    path: Optional[str]
+    worklogs: dict[int, dict]
+    from_date: Optional[str]
+    watermark: Optional[str]
+    full_sync: Optional[str]
+    changes: list[Optional[str]]
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        reconcile_days: int = TEMPO_RECONCILE_DAYS,
+        full_sync_days: int = TEMPO_FULL_SYNC_DAYS,
+    ) -> None:
+        self.path = os.path.join(path, "worklogs.json.gz") if path else None
+        self.reconcile_days = reconcile_days
+        self.full_sync_days = full_sync_days
+        self.worklogs = {}
+        self.from_date = None
+        self.watermark = None
+        self.full_sync = None
+        self.changes = []
+        self.read()
+
+    def read(self) -> None:
+        """Read the store from disk, an unreadable or outdated file is ignored"""
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as fh:
+                stored = json.load(fh)
+        except (OSError, ValueError) as err:
+            logging.warning("Ignoring worklog store %s: %s", self.path, err)
+            return
+        if stored.get("version") != STORE_VERSION:
+            logging.info("Worklog store version changed, doing a full sync")
+            return
+        self.worklogs = {log["tempoWorklogId"]: log for log in stored["worklogs"]}
+        self.from_date = stored["from_date"]
+        self.watermark = stored["watermark"]
+        self.full_sync = stored["full_sync"]
+        logging.info("Read %s worklogs from %s", len(self.worklogs), self.path)
+
+    def write(self) -> None:
+        """Write the store to disk, replacing the old file atomically"""
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        stored = {
+            "version": STORE_VERSION,
+            "from_date": self.from_date,
+            "watermark": self.watermark,
+            "full_sync": self.full_sync,
+            "worklogs": list(self.worklogs.values()),
+        }
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as fh:
+            json.dump(stored, fh)
+        os.replace(tmp_path, self.path)
+
+    def needsFullSync(self, from_date: str, today: str) -> bool:
+        if not self.worklogs or self.watermark is None or self.from_date is None or self.full_sync is None:
+            return True
+        if from_date < self.from_date:
+            return True
+        return pd.Timestamp(today) - pd.Timestamp(self.full_sync) > pd.Timedelta(days=self.full_sync_days)
+
+    @property
+    def generation(self) -> int:
+        """The number of syncs done"""
+        return len(self.changes)
+
+    def changedSince(self, generation: int) -> Optional[str]:
+        """The first day changed by the syncs after the given generation, None if unknown"""
+        later = self.changes[generation:]
+        if not later or None in later:
+            return None
+        return min(cast(list[str], later))
+
+    def markChanged(self, day: str) -> None:
+        """Records a change of the worklogs of day that the last sync did not see, like a moved issue"""
+        if self.changes and self.changes[-1] is not None:
+            self.changes[-1] = min(self.changes[-1], _day(day))
+
+    def upsert(self, logs: list) -> Optional[str]:
+        """Stores the logs and returns the first day of those that changed, also the day they moved from"""
+        first = None
+        for log in logs:
+            old = self.worklogs.get(log["tempoWorklogId"])
+            if old != log:
+                days = [log["startDate"]] + ([old["startDate"]] if old else [])
+                first = min(days + ([first] if first else []))
+            self.worklogs[log["tempoWorklogId"]] = log
+        return first
+
+    def sync(self, client: Client.Tempo, from_date, to_date) -> list:
+        """Bring the store up to date with Tempo and return the worklogs in the date range"""
+        from_date = _day(from_date)
+        to_date = _day(to_date)
+        today = _day(pd.Timestamp.utcnow())
+
+        if self.needsFullSync(from_date, today):
+            logs = client.get_worklogs(dateFrom=from_date, dateTo=to_date)
+            self.worklogs = {}
+            self.upsert(logs)
+            self.from_date = from_date
+            self.full_sync = today
+            self.changes.append(None)
+            logging.info("Full worklog sync: %s worklogs", len(logs))
+        else:
+            # Edits anywhere in the range, updatedFrom only has day resolution so the overlap is refetched
+            changed = client.get_worklogs(dateFrom=from_date, dateTo=to_date, updatedFrom=self.watermark)
+            # Nothing changed is recorded as the day after the range
+            days = [_day(pd.Timestamp(to_date) + pd.Timedelta(days=1)), self.upsert(changed)]
+            # Deletions, by comparing the ids in the recent window with what Tempo still has
+            window_start = max(from_date, _day(pd.Timestamp(to_date) - pd.Timedelta(days=self.reconcile_days)))
+            recent = client.get_worklogs(dateFrom=window_start, dateTo=to_date)
+            recent_ids = {log["tempoWorklogId"] for log in recent}
+            deleted = [
+                worklog_id
+                for worklog_id, log in self.worklogs.items()
+                if window_start <= log["startDate"] <= to_date and worklog_id not in recent_ids
+            ]
+            days += [self.worklogs[worklog_id]["startDate"] for worklog_id in deleted]
+            for worklog_id in deleted:
+                del self.worklogs[worklog_id]
+            days.append(self.upsert(recent))
+            self.changes.append(min(day for day in days if day is not None))
+            logging.info(
+                "Incremental worklog sync: %s changed, %s in recent window, %s deleted",
+                len(changed),
+                len(recent),
+                len(deleted),
+            )
+
+        self.watermark = _day(pd.Timestamp(today) - pd.Timedelta(days=1))
+        self.write()
+        logs = [log for log in self.worklogs.values() if from_date <= log["startDate"] <= to_date]
+        return sorted(logs, key=lambda log: (log["startDate"], log["tempoWorklogId"]))
@@ -0,0 +1,55 @@
+"""
+    Tests for the allocation timeline
+"""
+
+import unittest
+
+import pandas as pd
+
+from metrics.allocation_timeline import allocationColor, allocationTimeline
+
+
+def allocations() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "User": ["Alice", "Alice", "Bob", "Bob", "Carol"],
+            "Allocation": [0.5, 0.5, 0.6, 0.6, 0.2],
+            "Start": pd.to_datetime(["2024-01-01", "2024-01-11", "2024-01-01", "2024-01-21", "2024-01-01"]),
+            "Stop": pd.to_datetime(["2024-01-31", "2024-01-20", "2024-01-10", "2024-01-31", "2024-01-31"]),
+            "Unconfirmed": [False, False, False, False, True],
+            "JiraID": ["AB-1", "CD-1", "?", "?", "AB-1"],
+        }
+    )
+
+
+class TestAllocationTimeline(unittest.TestCase):
+    "tests for allocationTimeline() and allocationColor()"
+
+    def test_timeline(self):
+        timeline = allocationTimeline(allocations())
+        alice = timeline[timeline["User"] == "Alice"]
+        self.assertEqual(list(alice["Allocation"]), [0.5, 0.5, 1.0])
+        self.assertEqual(list(alice["JiraID"]), ["AB-1", "AB-1", "AB-1,CD-1"])
+        self.assertEqual(list(alice["Start"].dt.day), [1, 21, 11])
+        self.assertEqual(list(alice["Stop"].dt.day), [10, 31, 20])
+        # The same allocation in periods with a gap between them is not joined
+        bob = timeline[timeline["User"] == "Bob"]
+        self.assertEqual(list(bob["Start"].dt.day), [1, 21])
+
+    def test_adjacent_joined(self):
+        adjacent = allocations().iloc[2:4]
+        adjacent.loc[3, "Start"] = pd.Timestamp("2024-01-11")
+        timeline = allocationTimeline(adjacent)
+        self.assertEqual(len(timeline), 1)
+        self.assertEqual(timeline["Stop"][0], pd.Timestamp("2024-01-31"))
+
+    def test_color(self):
+        timeline = allocationTimeline(allocations())
+        self.assertEqual(
+            list(allocationColor(timeline)),
+            ["OK", "OK", "More than 80%", "Missing Jira", "Missing Jira", "Unconfirmed"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+"""
+    Tests for recording and replaying API responses
+"""
+
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from metrics.api_snapshot import JIRA_METHODS, ApiSnapshot
+
+
+class FakeJira:
+    """Counts the calls to search_users"""
+
+    calls = 0
+
+    def search_users(self, startAt=0, maxResults=50, query=None):
+        self.calls += 1
+        return [SimpleNamespace(raw={"accountId": "1", "displayName": "Alice"})]
+
+
+class TestApiSnapshot(unittest.TestCase):
+    "tests for ApiSnapshot"
+
+    def test_inactive_returns_client(self):
+        client = FakeJira()
+        self.assertIs(ApiSnapshot("unused").proxy("jira", client, JIRA_METHODS), client)
+
+    def test_record_and_replay(self):
+        with tempfile.TemporaryDirectory() as path:
+            snapshot_path = os.path.join(path, "snapshot.json.gz")
+            recorder = ApiSnapshot(snapshot_path, "record")
+            client = FakeJira()
+            recorder.proxy("jira", client, JIRA_METHODS).search_users(startAt=0, maxResults=200, query="*")
+            recorder.write()
+
+            replayer = ApiSnapshot(snapshot_path, "replay")
+            users = replayer.proxy("jira", None, JIRA_METHODS).search_users(startAt=0, maxResults=200, query="*")
+            self.assertEqual(users[0].displayName, "Alice")
+            self.assertEqual(client.calls, 1)
+            with self.assertRaises(KeyError):
+                replayer.proxy("jira", None, JIRA_METHODS).search_users(startAt=200, maxResults=200, query="*")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+"""
+    Tests for the business day calendar
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from metrics.business_calendar import BusinessCalendar
+from metrics.date_utils import weekdays
+
+
+class TestBusinessCalendar(unittest.TestCase):
+    "tests for BusinessCalendar"
+
+    calendar = BusinessCalendar(
+        pd.DataFrame({"Date": ["2022-12-26", "2023-01-06", "2023-06-23"], "Country": ["", "FI", "SE"]})
+    )
+
+    def test_like_weekdays_without_holidays(self):
+        calendar = BusinessCalendar()
+        from_dates = ["2022-01-01", "2022-01-03", "2021-12-20", "2019-05-05", "2022-06-17"]
+        to_dates = ["2022-01-01", "2022-01-07", "2022-01-14", "2023-02-28", "2022-06-22"]
+        expected = [weekdays(f, t) for f, t in zip(from_dates, to_dates)]
+        self.assertEqual(list(calendar.count(from_dates, to_dates)), expected)
+
+    def test_backwards_like_busday_count(self):
+        calendar = BusinessCalendar()
+        self.assertEqual(calendar.count("2022-06-22", "2022-06-17")[0], np.busday_count("2022-06-22", "2022-06-18"))
+        self.assertEqual(calendar.count("2022-06-22", "2022-06-21")[0], 0)
+
+    def test_holidays_by_country(self):
+        # Mon 2022-12-26 is a holiday everywhere, Fri 2023-01-06 in Finland and Fri 2023-06-23 in Sweden
+        self.assertEqual(list(self.calendar.count("2022-12-26", "2023-01-06")), [9])
+        self.assertEqual(list(self.calendar.count("2022-12-26", "2023-01-06", country="FI")), [8])
+        self.assertEqual(
+            list(self.calendar.count(["2023-06-19", "2023-06-19"], "2023-06-25", country=["SE", "FI"])), [4, 5]
+        )
+
+    def test_weekmask_per_row(self):
+        rows = pd.DataFrame({"Weekmask": ["1111100", "1111000", "1010100"], "Country": ["", "FI", ""]})
+        days = self.calendar.countRows(rows, pd.to_datetime(["2023-01-02"] * 3), pd.to_datetime(["2023-01-08"] * 3))
+        self.assertEqual(list(days), [5, 4, 3])
+        self.assertEqual(list(self.calendar.countRows(rows[[]], "2023-01-02", ["2023-01-08"])), [5])
+
+    def test_grows(self):
+        self.assertEqual(list(self.calendar.count("1999-12-27", "1999-12-31")), [5])
+        self.assertEqual(list(self.calendar.count("2031-12-29", "2032-01-02")), [5])
+        self.assertEqual(len(self.calendar.count([], [])), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+    Tests for the daily cube of TempoData and the rollups derived from it
+"""
+
+import unittest
+
+import numpy as np
+from tests.test_tempo_views import tempoData
+
+
+class TestDailyCube(unittest.TestCase):
+    "tests for TempoData.dailyCube() and TempoData.rollup()"
+
+    def test_daily_cube(self):
+        cube = tempoData().dailyCube()
+        self.assertEqual(list(cube["Key"]), ["AB-1", "AB-1", "IN-1", "VF-1", "AB-1", "DK-1", "EU-1", "NO-1"])
+        self.assertEqual(list(cube["Time"]), [2.0, 3.0, 3.0, 4.0, 5.0, 1.0, 1.0, 1.0])
+        self.assertEqual(list(cube["Rate"].fillna(0)), [100.0, 100.0, 0.0, 0.0, 80.0, 0.0, 100.0, 0.0])
+
+    def test_rollup_cached(self):
+        tempo = tempoData()
+        by_group = tempo.byGroup()
+        self.assertIs(tempo.byGroup(), by_group)
+        self.assertEqual(list(by_group["Time"]), [2.0, 3.0, 3.0, 4.0, 5.0, 1.0, 1.0, 1.0])
+        tempo.data = tempo.data[tempo.data["User"] == "Alice"]
+        self.assertEqual(list(tempo.byGroup()["Time"]), [2.0, 3.0, 3.0])
+
+    def test_raw_rates_table(self):
+        tempo = tempoData()
+        rates = tempo.rawRatesTable()
+        self.assertEqual(list(rates["Key"]), ["AB-1", "AB-1", "DK-1", "EU-1", "NO-1"])
+        self.assertEqual(list(rates["Rate"]), [80.0, 100.0, "???", 100.0, "???"])
+        self.assertEqual(list(rates["Hours"]), [5.0, 5.0, 1.0, 1.0, 1.0])
+        self.assertIs(tempo.rawRatesTable(), rates)
+        tempo.data = tempo.data.assign(Rate=tempo.data["Rate"].replace(80.0, 100.0))
+        ab = tempo.rawRatesTable().query("Key == 'AB-1'")
+        self.assertEqual(list(ab["Users"]), ["Alice, Bob"])
+        tempo.data = tempo.data.assign(Rate=tempo.data["Rate"].where(tempo.data["User"] == "Alice", np.nan))
+        ab = tempo.rawRatesTable().query("Key == 'AB-1'")
+        self.assertEqual(list(ab["Rate"]), [100.0, "???"])
+        self.assertEqual(list(ab["Users"]), ["Alice", "Bob"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+    Tests for the dense daily grid
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from metrics.daily_grid import DailyGrid, rollingMean
+
+
+def padded(days: int, start: str = "2022-01-03") -> pd.DataFrame:
+    return pd.DataFrame(
+        {"User": ["Alice"], "Start": [pd.Timestamp(start)], "Stop": [pd.Timestamp(start) + pd.Timedelta(days=days - 1)]}
+    )
+
+
+class TestDailyGrid(unittest.TestCase):
+    "tests for DailyGrid"
+
+    data = pd.DataFrame(
+        {
+            "User": ["Alice", "Alice", "Alice", "Bob"],
+            "Date": pd.to_datetime(["2022-01-03", "2022-01-03", "2022-01-09", "2022-01-20"]),
+            "Time": [1.0, 2.0, 4.0, 8.0],
+        }
+    )
+
+    def test_user_rolling(self):
+        grid = DailyGrid(self.data, ["Time"], padded(7))
+        rolling = grid.userRolling("Time")
+        alice = rolling[rolling["User"] == "Alice"]
+        self.assertEqual(len(alice), 7)
+        self.assertTrue(np.isnan(alice["Time"].iloc[5]))
+        self.assertEqual(alice["Time"].iloc[6], 7.0)
+        # Bob has a single day without padding, so it never has a full window
+        self.assertEqual(list(rolling["User"]).count("Bob"), 1)
+        self.assertTrue(np.isnan(rolling["Time"].iloc[-1]))
+
+    def test_same_as_pandas_rolling(self):
+        grid = DailyGrid(self.data, ["Time"], padded(20))
+        rolling = grid.userRolling("Time")
+        daily = self.data.groupby(["User", "Date"], as_index=False)["Time"].sum()
+        padding = pd.DataFrame({"User": "Alice", "Date": pd.date_range("2022-01-03", periods=20), "Time": 0.0})
+        daily = pd.concat([daily, padding]).groupby(["Date", "User"], as_index=False)["Time"].sum()
+        expected = daily.set_index("Date").groupby("User").rolling("7d", min_periods=7)["Time"].sum().reset_index()
+        pd.testing.assert_frame_equal(rolling, expected[["User", "Date", "Time"]])
+
+    def test_team(self):
+        grid = DailyGrid(self.data, ["Time"], padded(7))
+        daily = grid.teamDaily("Time")
+        self.assertEqual(list(daily["Time"]), [3.0, 0.0, 0.0, 0.0, 0.0, 0.0, 4.0, 8.0])
+        rolling = grid.teamRolling("Time")
+        self.assertEqual(rolling["Time"].iloc[6], 7.0)
+        self.assertTrue(np.isnan(rolling["Time"].iloc[7]))
+
+    def assertSameGrid(self, grid, fresh):
+        np.testing.assert_array_equal(grid.values["Time"], fresh.values["Time"])
+        np.testing.assert_array_equal(grid.present, fresh.present)
+        np.testing.assert_array_equal(grid.cumulative["Time"], fresh.cumulative["Time"])
+        pd.testing.assert_frame_equal(grid.userRolling("Time"), fresh.userRolling("Time"))
+
+    def test_previous(self):
+        previous = DailyGrid(self.data, ["Time"], padded(20), inputs="notion")
+        changed = self.data.copy()
+        changed.loc[2, "Time"] = 5.0
+        grid = DailyGrid(changed, ["Time"], padded(20), previous, "2022-01-09", "notion")
+        self.assertEqual(grid.since, 6)
+        self.assertSameGrid(grid, DailyGrid(changed, ["Time"], padded(20)))
+        self.assertEqual(previous.values["Time"][0, 6], 4.0)
+
+        appended = pd.concat([changed, pd.DataFrame({"User": ["Bob"], "Date": [pd.Timestamp("2022-01-25")]})])
+        appended["Time"] = appended["Time"].fillna(1.0)
+        longer = DailyGrid(appended, ["Time"], padded(20), grid, "2022-01-25", "notion")
+        self.assertEqual(longer.since, len(grid.dates))
+        self.assertSameGrid(longer, DailyGrid(appended, ["Time"], padded(20)))
+        shorter = DailyGrid(changed, ["Time"], padded(20), longer, "2022-01-25", "notion")
+        self.assertSameGrid(shorter, DailyGrid(changed, ["Time"], padded(20)))
+
+        self.assertEqual(DailyGrid(changed, ["Time"], padded(20), grid, "2022-01-09", "other").since, 0)
+        self.assertEqual(DailyGrid(changed, ["Time"], padded(20), grid, None, "notion").since, 0)
+        self.assertEqual(DailyGrid(changed, ["Time"], padded(20, "2022-01-01"), grid, "2022-01-09", "notion").since, 0)
+
+    def test_rolling_mean_same_as_pandas(self):
+        frame = pd.DataFrame(
+            {
+                "Date": pd.to_datetime(
+                    ["2022-01-01", "2022-01-02", "2022-01-02", "2022-01-03", "2022-01-05", "2022-01-09"]
+                ),
+                "Diff": [1.0, np.nan, 2.0, np.inf, 4.0, 8.0],
+            }
+        )
+        expected = frame.set_index("Date").rolling("5d", min_periods=2)["Diff"].mean().reset_index()
+        pd.testing.assert_frame_equal(rollingMean(frame, "Diff", 5, 2), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,8 +3,19 @@
 """
 
 import unittest
+from unittest import mock
 
-from metrics.date_utils import lastMonthDay, leapYear, lookAhead, weekdays
+import pandas as pd
+
+from metrics.date_utils import (
+    dateSlice,
+    lastMonthDay,
+    leapYear,
+    lookAhead,
+    lookBack,
+    monthBegin,
+    weekdays,
+)
 
 
 class TestWeekdays(unittest.TestCase):
@@ -50,6 +61,14 @@ class TestLookAhead(unittest.TestCase):
     def test_increament_one(self):
         self.assertEqual(str(lookAhead(1, "2022-01-01").date()), "2022-01-02", "Should be 2022-01-02")
 
+    @mock.patch("metrics.date_utils.api_snapshot.today")
+    def test_today_on_every_call(self, today):
+        today.return_value = pd.Timestamp("2022-01-31 12:00")
+        self.assertEqual(lookAhead(1), pd.Timestamp("2022-02-01"))
+        today.return_value = pd.Timestamp("2022-03-01 12:00")
+        self.assertEqual(lookBack(1), pd.Timestamp("2022-02-28"))
+        self.assertEqual(monthBegin(), "2022-03-01")
+
 
 class TestLeapYear(unittest.TestCase):
     "tests for the leapYear() function"
@@ -92,5 +111,19 @@ class TestLastMonthDay(unittest.TestCase):
         self.assertEqual(lastMonthDay("2022-04"), "2022-04-30", "Should be 2022-04-30")
 
 
+class TestDateSlice(unittest.TestCase):
+    """tests for the dateSlice() function"""
+
+    frame = pd.DataFrame({"Date": pd.to_datetime(["2022-01-01", "2022-01-02", "2022-01-02", "2022-01-04"])})
+
+    def test_after_until(self):
+        self.assertEqual(list(dateSlice(self.frame, "2022-01-01", "2022-01-02").index), [1, 2])
+
+    def test_open_ends(self):
+        self.assertEqual(len(dateSlice(self.frame)), 4)
+        self.assertEqual(list(dateSlice(self.frame, after="2022-01-02").index), [3])
+        self.assertEqual(list(dateSlice(self.frame, until="2021-12-31").index), [])
+
+
 if __name__ == "__main__":
     unittest.main()
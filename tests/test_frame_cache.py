@@ -0,0 +1,53 @@
+"""
+    Tests for the processed frame cache
+"""
+
+import tempfile
+import unittest
+
+import pandas as pd
+
+from metrics.frame_cache import FrameCache, feather, inputHash
+
+
+class TestInputHash(unittest.TestCase):
+    "tests for inputHash()"
+
+    def test_same_inputs(self):
+        frame = pd.DataFrame({"User": ["Alice", "Bob"], "Time": [1.0, 2.0]})
+        self.assertEqual(inputHash({"tempo": frame}), inputHash({"tempo": frame.copy()}))
+
+    def test_changed_inputs(self):
+        frame = pd.DataFrame({"User": ["Alice", "Bob"], "Time": [1.0, 2.0]})
+        changed = frame.assign(Time=[1.0, 3.0])
+        self.assertNotEqual(inputHash({"tempo": frame}), inputHash({"tempo": changed}))
+
+    def test_changed_run_date(self):
+        frame = pd.DataFrame({"User": ["Alice", "Bob"], "Time": [1.0, 2.0]})
+        self.assertNotEqual(inputHash({"tempo": frame}, "2022-01-03"), inputHash({"tempo": frame}, "2022-01-04"))
+
+
+@unittest.skipIf(feather is None, "pyarrow is not installed")
+class TestFrameCache(unittest.TestCase):
+    "tests for FrameCache"
+
+    def test_store_and_load(self):
+        frame = pd.DataFrame({"Date": pd.to_datetime(["2022-01-03", "2022-01-04"]), "Time": [1.0, 2.0]})
+        with tempfile.TemporaryDirectory() as path:
+            cache = FrameCache(path)
+            self.assertIsNone(cache.load("key"))
+            cache.store("key", {"data": frame, "empty": pd.DataFrame()}, "2022-01-04")
+            frames = cache.load("key")
+            pd.testing.assert_frame_equal(frames["data"], frame)
+            self.assertTrue(frames["empty"].empty)
+            self.assertIsNotNone(cache.latest(pd.Timedelta(hours=1), "2022-01-04"))
+            self.assertIsNone(cache.latest(pd.Timedelta(hours=1), "2022-01-05"))
+
+    def test_disabled_without_path(self):
+        cache = FrameCache()
+        cache.store("key", {"data": pd.DataFrame()})
+        self.assertIsNone(cache.load("key"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+    Tests for the cached Jira lookups
+"""
+
+import re
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from jira import JIRAError
+
+from metrics.jira_data import IssueResolver, UserDirectory
+
+
+class FakeJira:
+    """Answers `id in (...)` and `updated >= ...` queries from a dict of id -> key"""
+
+    def __init__(self, issues):
+        self.issues = issues
+        self.updated = {}
+        self.queries = []
+
+    def search_issues(self, jql_str, startAt=0, maxResults=50, fields=None, validate_query=True):
+        self.queries.append(jql_str)
+        match = re.match(r"id in \((.*)\)", jql_str)
+        if match:
+            ids = [int(issue_id) for issue_id in match.group(1).split(",")]
+            found = [(issue_id, self.issues[issue_id]) for issue_id in ids if issue_id in self.issues]
+        else:
+            found = list(self.updated.items())
+        return [SimpleNamespace(id=str(i), key=k) for i, k in found[startAt : startAt + maxResults]]
+
+
+class TestIssueResolver(unittest.TestCase):
+    "tests for IssueResolver.resolve()"
+
+    def test_only_unknown_ids_are_fetched(self):
+        with tempfile.TemporaryDirectory() as path:
+            jira = FakeJira({1: "AB-1", 2: "AB-2", 3: "CD-1"})
+            issues = IssueResolver(path, batch_size=2).resolve(jira, [1, 2, 2, 3])
+            self.assertEqual(list(issues["Key"]), ["AB-1", "AB-2", "CD-1"])
+
+            jira.queries = []
+            issues = IssueResolver(path).resolve(jira, [1, 3])
+            self.assertEqual(list(issues["Key"]), ["AB-1", "CD-1"])
+            self.assertFalse([query for query in jira.queries if query.startswith("id in")])
+
+    def test_moved_issue(self):
+        jira = FakeJira({1: "AB-1", 2: "AB-2"})
+        resolver = IssueResolver()
+        resolver.resolve(jira, [1, 2])
+        jira.updated = {2: "CD-7"}
+        issues = resolver.resolve(jira, [1, 2])
+        self.assertEqual(list(issues["Key"]), ["AB-1", "CD-7"])
+
+    def test_unknown_issue_is_dropped(self):
+        issues = IssueResolver().resolve(FakeJira({1: "AB-1"}), [1, 5])
+        self.assertEqual(list(issues["IssueId"]), [1])
+
+
+class FakeUsers:
+    """Pages through a dict of accountId -> displayName, users in hidden are only found by user()"""
+
+    def __init__(self, users, hidden=None):
+        self.users = users
+        self.hidden = hidden or {}
+        self.pages = 0
+        self.lookups = []
+
+    def search_users(self, startAt=0, maxResults=50, query=None):
+        self.pages += 1
+        found = list(self.users.items())[startAt : startAt + maxResults]
+        return [SimpleNamespace(accountId=a, displayName=n) for a, n in found]
+
+    def user(self, account_id):
+        self.lookups.append(account_id)
+        if account_id not in self.hidden:
+            raise JIRAError(status_code=404, text="User not found")
+        return SimpleNamespace(accountId=account_id, displayName=self.hidden[account_id])
+
+
+class TestUserDirectory(unittest.TestCase):
+    "tests for UserDirectory.resolve()"
+
+    def test_all_pages_are_read(self):
+        jira = FakeUsers({str(i): f"User {i}" for i in range(5)})
+        users = UserDirectory(page_size=2).resolve(jira, ["4", "0", "4"])
+        self.assertEqual(list(users["User"]), ["User 0", "User 4"])
+        self.assertEqual(jira.pages, 4)
+
+    def test_cached_directory(self):
+        with tempfile.TemporaryDirectory() as path:
+            UserDirectory(path).resolve(FakeUsers({"a": "Alice"}), ["a"])
+            jira = FakeUsers({"a": "Alice"}, hidden={"b": "Bob"})
+            users = UserDirectory(path).resolve(jira, ["a", "b", "c"])
+            self.assertEqual(list(users["User"]), ["Alice", "Bob"])
+            self.assertEqual(jira.pages, 0)
+            self.assertEqual(jira.lookups, ["b", "c"])
+
+    def test_expired_directory(self):
+        with tempfile.TemporaryDirectory() as path:
+            UserDirectory(path).resolve(FakeUsers({"a": "Alice"}), ["a"])
+            jira = FakeUsers({"a": "Alice Renamed"})
+            users = UserDirectory(path, max_age=0).resolve(jira, ["a"])
+            self.assertEqual(list(users["User"]), ["Alice Renamed"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+"""
+    Tests for the memory usage helpers
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from metrics.memory import MemoryReport, downcast
+
+
+class TestMemory(unittest.TestCase):
+    "tests for downcast and MemoryReport"
+
+    def test_downcast(self):
+        frame = pd.DataFrame({"Year": [2023, 2024], "Time": [0.25, 7.5], "Rate": [1 / 3, 2.0], "Name": ["a", "b"]})
+        result = downcast(frame, ["Year", "Time", "Rate"])
+        self.assertEqual(result["Year"].dtype, np.int16)
+        self.assertEqual(result["Time"].dtype, np.float32)
+        self.assertEqual(result["Rate"].dtype, np.float64)
+        self.assertEqual(frame["Time"].dtype, np.float64)
+        self.assertEqual(downcast(frame, ["Rate"], tolerance=1e-6)["Rate"].dtype, np.float32)
+
+    def test_budget(self):
+        frame = pd.DataFrame({"Time": np.zeros(1024 * 1024)})
+        report = MemoryReport(budget=10)
+        report.record("Small", {"data": frame})
+        report.check()
+        report.record("Large", {"data": frame, "copy": frame.copy(), "array": np.zeros((1024, 1024))})
+        self.assertAlmostEqual(report.total("Large"), 24, places=0)
+        with self.assertRaises(MemoryError):
+            report.check()
+        self.assertEqual(list(report.frame()["Stage"]), ["Small", "Large", "Large", "Large"])
+
+    def test_budget_not_strict(self):
+        report = MemoryReport(budget=1, strict=False)
+        report.record("Large", {"array": np.zeros((1024, 1024))})
+        with self.assertLogs(level="ERROR"):
+            report.check()
+
+
+if __name__ == "__main__":
+    unittest.main()
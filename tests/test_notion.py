@@ -4,6 +4,7 @@ Checks for the Notion
 """
 
 import unittest
+from unittest import mock
 
 import pandas as pd
 
@@ -21,6 +22,7 @@ from metrics.constants import (
 )
 from metrics.notion import (
     Allocations,
+    Column,
     Crew,
     Financials,
     Notion,
@@ -29,9 +31,63 @@ from metrics.notion import (
     RatesExceptions,
     RatesInternal,
     WorkingHours,
+    extract,
+    retryDelay,
 )
 
 
+def response(status_code, payload=None, headers=None):
+    return mock.Mock(status_code=status_code, headers=headers or {}, json=mock.Mock(return_value=payload))
+
+
+class TestNotionClient(unittest.TestCase):
+    """offline tests for the Notion client"""
+
+    def test_retry_after(self):
+        self.assertEqual(retryDelay(response(429, headers={"Retry-After": "3"}), 0), 3)
+
+    def test_backoff(self):
+        self.assertEqual(retryDelay(response(503), 2), 4)
+
+    @mock.patch("metrics.notion.time.sleep")
+    @mock.patch("metrics.notion.session")
+    def test_pages_and_retries(self, session, sleep):
+        session.post.side_effect = [
+            response(200, {"results": [1, 2], "has_more": True, "next_cursor": "c1"}),
+            response(429, headers={"Retry-After": "1"}),
+            response(200, {"results": [3], "has_more": False, "next_cursor": None}),
+        ]
+        self.assertEqual(Notion("token", "db").fetch_data(), [1, 2, 3])
+        self.assertEqual(session.post.call_args.kwargs["json"], {"start_cursor": "c1"})
+        sleep.assert_called_once_with(1.0)
+
+    def test_extract(self):
+        schema = [
+            Column("User", ("User", "title", 0, "plain_text")),
+            Column("Rate", ("Rate", "number"), "float", 0),
+        ]
+        rows = [
+            {"properties": {"User": {"title": [{"plain_text": "Alice"}]}, "Rate": {"number": 100}}},
+            {"properties": {"User": {"title": []}, "Rate": {"number": None}}},
+        ]
+        data = extract(rows, schema)
+        self.assertEqual(data["User"][1], "Alice")
+        self.assertIsNone(data["User"][0])
+        self.assertEqual(data["Rate"][0], 0.0)
+
+    @mock.patch.object(RatesCurrency, "parse")
+    def test_currency_rates(self, parse):
+        parse.return_value = pd.DataFrame(
+            {"Date": ["2022-01-01", None], "SEK2EUR": [0.1, 0.08], "DKK2EUR": [None, 0.125]}
+        )
+        rates = RatesCurrency("token", "db")
+        rates.get_rates()
+        self.assertEqual(list(rates.data.columns), ["Date", "Currency", "Per EUR"])
+        self.assertEqual(list(rates.data["Currency"]), ["SEK", "SEK", "DKK"])
+        self.assertEqual(list(rates.data["Per EUR"]), [10.0, 12.5, 8.0])
+        self.assertEqual(rates.data["Date"][1], pd.Timestamp("1970-01-01"))
+
+
 class TestNotion(unittest.TestCase):
 
     def test_notion_more_than_100(self):
@@ -69,7 +125,8 @@ class TestRates(unittest.TestCase):
     def test_currency_conversion(self):
         r = RatesCurrency(NOTION_KEY, NOTION_CURRENCY_RATES_DATABASE_ID)
         r.get_rates()
-        self.assertEqual(0.1, r.data.loc[0]["SEK2EUR"])
+        sek = r.data[r.data["Currency"] == "SEK"]
+        self.assertAlmostEqual(1 / 0.1, sek["Per EUR"].iloc[0])
 
     def test_default_rates(self):
         r = RatesDefault(NOTION_KEY, NOTION_DEFAULT_RATES_DATABASE_ID)
@@ -0,0 +1,43 @@
+"""
+    Tests for the supplementary data
+"""
+
+import unittest
+
+import pandas as pd
+
+from metrics.supplementary_data import SupplementaryData
+
+
+class TestSupplementaryData(unittest.TestCase):
+    "tests for SupplementaryData"
+
+    def test_daily_costs(self):
+        monthly = pd.DataFrame(
+            {"Month": ["2024-01", "2024-02"], "External_cost": [310.0, 290.0], "Starting_amount": [5.0, 6.0]}
+        )
+        costs = SupplementaryData.dailyCosts(monthly, "2024-01")
+        self.assertEqual(len(costs), 31 + 29)
+        self.assertEqual(costs.index[0], pd.Period("2024-01-01", freq="D"))
+        self.assertEqual(list(costs["Date"])[-1], pd.Period("2024-02-29", freq="D"))
+        self.assertEqual(set(costs["External_cost"]), {10.0})
+        self.assertEqual(list(costs["Starting_amount"])[30:32], [5.0, 6.0])
+        self.assertNotIn("Month", costs)
+
+    def test_alumni_removed(self):
+        working_hours = pd.DataFrame({"User": ["Alice", "Bob", "Alice"], "Daily": [8, 8, 6]})
+        supplementary = SupplementaryData(pd.DataFrame(), working_hours, pd.DataFrame(), pd.DataFrame())
+        supplementary.load(pd.Series(["Alice"]))
+        self.assertEqual(list(supplementary.working_hours["Daily"]), [8, 6])
+
+    def test_rates(self):
+        default_rates = pd.DataFrame({"Key": ["AB-1"], "Rate": [100.0], "Currency": ["EUR"]})
+        exceptional_rates = pd.DataFrame({"Key": ["AB-1", "CD-1"], "User": ["Alice", "Alice"], "Rate": [120.0, 90.0]})
+        supplementary = SupplementaryData(pd.DataFrame(), pd.DataFrame(), default_rates, exceptional_rates)
+        supplementary.load(pd.Series(["Alice", "Bob"]))
+        self.assertEqual(len(supplementary.rates), 1)
+        self.assertEqual(list(supplementary.exceptional_rates["Rate"]), [120])
+
+
+if __name__ == "__main__":
+    unittest.main()
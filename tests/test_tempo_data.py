@@ -10,10 +10,6 @@ class TestTempoData(unittest.TestCase):
 
     tempo: TempoData = TempoData(TEMPO_CONFIG_PATH)
 
-    def test_all_jira_issues(self):
-        issues = self.tempo.allJiraIssues()
-        self.assertGreater(len(issues), 400)
-
     def test_all_jira_users(self):
         users = self.tempo.allJiraUsers()
         self.assertGreater(len(users), 40)
@@ -0,0 +1,128 @@
+"""
+    Tests for the offline views of TempoData: rates, time types and date ranges
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from metrics.tempo_data import TempoData
+
+
+def tempoData() -> TempoData:
+    data = pd.DataFrame(
+        {
+            "Key": ["VF-1", "AB-1", "AB-1", "IN-1", "AB-1", "AB-1", "DK-1", "EU-1", "NO-1"],
+            "Group": ["VF", "AB", "AB", "IN", "AB", "AB", "DK", "EU", "NO"],
+            "User": ["Bob", "Alice", "Alice", "Alice", "Bob", "Alice", "Bob", "Bob", "Bob"],
+            "Date": pd.to_datetime(["2023-06-01"] * 4 + ["2023-06-02", "2022-06-01"] + ["2023-06-02"] * 3),
+            "Time": [4.0, 1.0, 2.0, 3.0, 5.0, 2.0, 1.0, 1.0, 1.0],
+            "Billable": [0.0, 1.0, 2.0, 0.0, 5.0, 2.0, 1.0, 1.0, 1.0],
+            "Rate": [np.nan, 100.0, 100.0, np.nan, 80.0, 100.0, np.nan, 100.0, np.nan],
+            "Year": [2023, 2023, 2023, 2023, 2023, 2022, 2023, 2023, 2023],
+        },
+        index=[5, 3, 9, 1, 0, 8, 2, 4, 6],
+    )
+    return TempoData.fromFrames(data)
+
+
+RATES = pd.DataFrame(
+    {
+        "Key": ["AB-1", "DK-1", "EU-1"],
+        "Rate": [1160.0, 746.0, 100.0],
+        "Currency": ["SEK", "DKK", "EUR"],
+    }
+)
+
+
+class TestInjectRates(unittest.TestCase):
+    "tests for TempoData.injectRates()"
+
+    def test_default_currency_rates(self):
+        tempo = tempoData()
+        tempo.injectRates(RATES)
+        rated = tempo.data.loc[[3, 9, 0, 8, 2, 4]]
+        self.assertEqual(list(rated["Rate"]), [100.0, 100.0, 100.0, 100.0, 100.0, 100.0])
+        self.assertEqual(list(rated["Income"]), [100.0, 200.0, 500.0, 200.0, 100.0, 100.0])
+        self.assertTrue(pd.isna(tempo.data["Income"][6]))
+
+    def test_dated_currency_rates(self):
+        currency_rates = pd.DataFrame(
+            {
+                "Date": pd.to_datetime(["2020-01-01", "2023-01-01"]),
+                "Currency": ["SEK", "SEK"],
+                "Per EUR": [11.6, 10.0],
+            }
+        )
+        tempo = tempoData()
+        tempo.injectRates(RATES, currency_rates)
+        self.assertEqual(list(tempo.data.loc[[8, 3, 2], "Rate"]), [100.0, 116.0, 746.0])
+
+    def test_exceptional_rates(self):
+        exceptional_rates = pd.DataFrame({"Key": ["EU-1", "EU-1"], "User": ["Bob", "Alice"], "Rate": [150, 200]})
+        tempo = tempoData()
+        tempo.injectRates(RATES, exceptional_rates=exceptional_rates)
+        self.assertEqual(list(tempo.data.loc[[3, 2, 4], "Rate"]), [100.0, 100.0, 150.0])
+        self.assertEqual(len(tempo.data), 9)
+
+
+class TestTimeType(unittest.TestCase):
+    "tests for TempoData.timeType() and TempoData.byTimeType()"
+
+    def test_time_type(self):
+        tempo = tempoData()
+        self.assertEqual(
+            list(tempo.timeType()),
+            [
+                "VeriFriday",
+                "Billable",
+                "Billable",
+                "Non-billable",
+                "Billable",
+                "Billable",
+                "Non-billable",
+                "Billable",
+                "Non-billable",
+            ],
+        )
+        rules = pd.DataFrame({"Group": ["VF", "IN"], "Timetype": ["VeriFriday", "Internal"]})
+        self.assertEqual(tempo.timeType(rules)[1], "Internal")
+
+    def test_by_time_type(self):
+        result = tempoData().byTimeType()
+        self.assertEqual(list(result.columns), ["Date", "Timetype", "Group", "Time"])
+        self.assertEqual(
+            list(result["Timetype"]),
+            [
+                "Billable",
+                "Billable",
+                "Non-billable",
+                "VeriFriday",
+                "Billable",
+                "Billable",
+                "Non-billable",
+                "Non-billable",
+            ],
+        )
+        self.assertEqual(list(result["Group"]), ["AB", "AB", "IN", "VF", "AB", "EU", "DK", "NO"])
+        self.assertEqual(list(result["Time"]), [2.0, 3.0, 3.0, 4.0, 5.0, 1.0, 1.0, 1.0])
+
+
+class TestDateRange(unittest.TestCase):
+    "tests for TempoData.dateRange() and TempoData.getYear()"
+
+    def test_get_year(self):
+        tempo = tempoData()
+        self.assertEqual(len(tempo.getYear(2023)), 8)
+        self.assertIs(tempo.thisYear(), tempo.getYear(2023))
+        self.assertEqual(list(tempo.lastYear()["Date"]), [pd.Timestamp("2022-06-01")])
+
+    def test_date_range_keeps_order(self):
+        tempo = tempoData()
+        tempo.data = tempo.data.iloc[::-1]
+        self.assertEqual(list(tempo.dateRange("2023-05-31", "2023-06-01").index), [1, 9, 3, 5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+"""
+    Tests for the per user index
+"""
+
+import unittest
+
+import pandas as pd
+
+from metrics.user_index import UserIndex
+
+
+class TestUserIndex(unittest.TestCase):
+    "tests for UserIndex"
+
+    index = UserIndex(
+        pd.DataFrame(
+            {
+                "User": ["Bob", "Alice", "Alice", "Alice", "Bob"],
+                "Date": pd.to_datetime(["2022-01-05", "2022-01-04", "2022-01-02", "2022-01-04", "2022-01-01"]),
+                "Time": [8.0, 1.0, 2.0, 4.0, 16.0],
+            }
+        )
+    )
+
+    def test_first_and_last(self):
+        self.assertEqual(self.index.first("Alice"), pd.Timestamp("2022-01-02"))
+        self.assertEqual(self.index.last("Bob"), pd.Timestamp("2022-01-05"))
+        self.assertEqual(self.index.last("Bob", before="2022-01-05"), pd.Timestamp("2022-01-01"))
+        self.assertTrue(pd.isna(self.index.last("Bob", before="2022-01-01")))
+        self.assertTrue(pd.isna(self.index.first("Carol")))
+
+    def test_total(self):
+        self.assertEqual(self.index.total("Alice", "2022-01-01"), 7.0)
+        self.assertEqual(self.index.total("Alice", "2022-01-03", "2022-01-04"), 5.0)
+        self.assertEqual(self.index.total("Bob", "2022-01-02", "2022-01-04"), 0.0)
+        self.assertEqual(self.index.total("Bob", "2022-01-05", "2022-01-01"), 0.0)
+        self.assertEqual(self.index.total("Carol", "2022-01-01"), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+    Tests for the incremental worklog store
+"""
+
+import tempfile
+import unittest
+
+from metrics.worklog_store import WorklogStore
+
+
+def worklog(worklog_id, start_date, seconds=3600):
+    return {"tempoWorklogId": worklog_id, "startDate": start_date, "timeSpentSeconds": seconds}
+
+
+class FakeTempo:
+    """Returns the worklogs in the date range, ignores updatedFrom"""
+
+    def __init__(self, worklogs):
+        self.worklogs = worklogs
+        self.calls = []
+
+    def get_worklogs(self, dateFrom, dateTo, updatedFrom=None):
+        self.calls.append((dateFrom, dateTo, updatedFrom))
+        return [log for log in self.worklogs if dateFrom <= log["startDate"] <= dateTo]
+
+
+class TestWorklogStore(unittest.TestCase):
+    "tests for WorklogStore.sync()"
+
+    def test_full_sync(self):
+        client = FakeTempo([worklog(1, "2022-01-03"), worklog(2, "2022-01-02")])
+        logs = WorklogStore().sync(client, "2022-01-01", "2022-01-31")
+        self.assertEqual([log["tempoWorklogId"] for log in logs], [2, 1])
+        self.assertEqual(len(client.calls), 1)
+
+    def test_incremental_sync_from_disk(self):
+        with tempfile.TemporaryDirectory() as path:
+            client = FakeTempo([worklog(1, "2022-01-03"), worklog(2, "2022-01-20")])
+            WorklogStore(path).sync(client, "2022-01-01", "2022-01-31")
+
+            client.worklogs = [worklog(1, "2022-01-03", 7200), worklog(3, "2022-01-25")]
+            store = WorklogStore(path, reconcile_days=20)
+            logs = store.sync(client, "2022-01-01", "2022-01-31")
+
+            self.assertIsNotNone(client.calls[-2][2], "Should only ask for updated worklogs")
+            self.assertEqual([log["tempoWorklogId"] for log in logs], [1, 3])
+            self.assertEqual(logs[0]["timeSpentSeconds"], 7200)
+
+    def test_deletions_outside_window_are_kept(self):
+        client = FakeTempo([worklog(1, "2022-01-03"), worklog(2, "2022-01-20")])
+        store = WorklogStore(reconcile_days=5)
+        store.sync(client, "2022-01-01", "2022-01-31")
+        client.worklogs = []
+        logs = store.sync(client, "2022-01-01", "2022-01-31")
+        self.assertEqual([log["tempoWorklogId"] for log in logs], [1, 2])
+
+    def test_changed_since(self):
+        client = FakeTempo([worklog(1, "2022-01-03"), worklog(2, "2022-01-20"), worklog(3, "2022-01-25")])
+        store = WorklogStore(reconcile_days=20)
+        store.sync(client, "2022-01-01", "2022-01-31")
+        self.assertIsNone(store.changedSince(0))
+        store.sync(client, "2022-01-01", "2022-01-31")
+        self.assertEqual(store.changedSince(1), "2022-02-01")
+
+        # Worklog 2 moved to a later day and 3 was deleted
+        client.worklogs = [worklog(1, "2022-01-03"), worklog(2, "2022-01-22")]
+        store.sync(client, "2022-01-01", "2022-01-31")
+        self.assertEqual(store.changedSince(2), "2022-01-20")
+        self.assertEqual(store.changedSince(1), "2022-01-20")
+        store.markChanged("2022-01-10")
+        self.assertEqual(store.changedSince(store.generation - 1), "2022-01-10")
+        self.assertIsNone(store.changedSince(store.generation))
+
+
+if __name__ == "__main__":
+    unittest.main()